@@ -1,13 +1,24 @@
 import os
 import sys
 import logging
-import socket
 import time
 import subprocess
 import json
 import threading
+import queue
+import random
+import asyncio
+import functools
+import sqlite3
+import hashlib
+import tempfile
+import bisect
+from collections import OrderedDict
+import numpy as np
 import pandas as pd
-from gwpy.timeseries import TimeSeries
+import h5py
+from gwpy.timeseries import TimeSeries, TimeSeriesDict
+from gwpy.io.gwf import get_channel_names
 from gwosc.datasets import find_datasets
 from gwosc.locate import get_urls
 from datetime import datetime
@@ -16,7 +27,10 @@ import argparse
 import shutil
 import platform
 import ctypes
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import multiprocessing
+from contextlib import contextmanager
+from urllib.parse import urlparse
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QTabWidget, QWidget, QVBoxLayout, QHBoxLayout,
                              QPushButton, QComboBox, QLineEdit, QFileDialog, QLabel, QCheckBox,
                              QTextEdit, QScrollArea, QFrame, QSlider, QMessageBox, QProgressBar,QListWidget)
@@ -24,7 +38,7 @@ from PyQt5.QtCore import Qt, QTimer, QMetaObject, QGenericArgument, pyqtSignal,
 from PyQt5.QtGui import QFont, QPalette, QColor, QLinearGradient, QBrush, QPainter
 from PyQt5.QtWidgets import QDialog
 import requests_pelican as rp
-from gwdatafind import find_urls, find_types
+from gwdatafind import find_urls, find_types, find_times
 from PyQt5.QtCore import pyqtSignal
 import requests
 from requests.exceptions import RequestException
@@ -80,6 +94,75 @@ if not os.path.exists(DEFAULT_GWFOUT):
     logging.info(f"Created default output directory: {DEFAULT_GWFOUT}")
 
 HISTORY_FILE = "gravfetch_history.json"
+
+# OSDF download engine defaults
+OSDF_MAX_WORKERS = 4   # Concurrent frame transfers
+OSDF_MAX_PER_HOST = 2  # Concurrent transfers against a single host
+OSDF_CHUNK_SIZE = 1024 * 1024  # Bytes read per chunk while streaming a frame to disk
+OSDF_POOL_SIZE = 16  # Keep-alive connections kept per host in each pooled session
+
+# Per-host request pacing. "rate" is requests per second, "burst" the bucket size; the rate climbs towards
+# "max_rate" while a host answers cleanly and halves (down to "min_rate") on every error. Any host can be
+# overridden in RATE_LIMITS_FILE, e.g. {"nds.gwosc.org": {"rate": 1, "max_rate": 4}}.
+RATE_LIMITS_FILE = "gravfetch_rate_limits.json"
+DEFAULT_RATE_LIMITS = {
+    "default": {"rate": 4.0, "burst": 8, "min_rate": 0.25, "max_rate": 16.0},
+    "datafind.gw-openscience.org": {"rate": 4.0, "burst": 8, "min_rate": 0.25, "max_rate": 20.0},
+    "datafind.gwosc.org": {"rate": 4.0, "burst": 8, "min_rate": 0.25, "max_rate": 20.0},
+    "nds.gwosc.org": {"rate": 1.0, "burst": 2, "min_rate": 0.1, "max_rate": 4.0},
+    "osdf": {"rate": 8.0, "burst": 16, "min_rate": 0.5, "max_rate": 32.0},
+}
+BACKOFF_BASE = 2     # Seconds before the first retry
+BACKOFF_CAP = 600    # Longest wait between retries (and between connectivity checks)
+
+# Shared asyncio fetch core
+FETCH_MAX_WORKERS = 64   # Threads available to blocking library calls (gwdatafind, gwpy, requests)
+SEGMENT_CONCURRENCY = 4  # Segments in flight at once for the Assoc and CLI paths
+
+# NDS process-pool mode
+NDS_HOST = "nds.gwosc.org"
+NDS_MAX_PROCESSES = 4            # Worker processes available for parallel NDS fetches
+NDS_MAX_CONNECTIONS_PER_HOST = 2 # Simultaneous NDS2 connections opened against one server
+FETCH_CHUNK_SECONDS = 1024      # Longer segments are fetched in chunks of this many seconds and stitched; file reads cut chunks only at frame-file edges
+SEGMENT_MERGE_GAP = 0           # Requested rows closer than this (s) are fetched through as one request; 0 merges only overlapping and touching rows
+MERGED_SPAN_RETRIES = 2         # A merged span that keeps failing is fetched row by row after this many attempts
+
+DATAFIND_SERVER = "datafind.gwosc.org"
+
+# Metadata caches. Each file holds a "ttl" (seconds) that can be edited to change how long entries stay fresh.
+FRAME_TYPES_CACHE_FILE = "gravfetch_frametypes.json"
+FRAME_TYPES_TTL = 24 * 3600
+NDS_CATALOG_DIR = "gravfetch_catalog"
+NDS_CATALOG_TTL = 7 * 24 * 3600
+NDS_SEARCH_LIMIT = 500  # Most channels listed for one search in the NDS browser
+SEGMENT_CACHE_DIR = "gravfetch_segments"
+SEGMENT_CACHE_TTL = 24 * 3600
+SEGMENT_CACHE_MAX_ENTRIES = 64  # (detector, frame type) segment tables kept before the least recently used goes
+URL_CACHE_FILE = "gravfetch_urls.json"
+URL_CACHE_TTL = 24 * 3600
+BULK_RESOLVE_MAX_GAP = 100000  # Segments further apart than this (s) get separate bulk URL lookups
+INVENTORY_FILE = "gravfetch_inventory.sqlite"  # Kept at the top of each output directory (e.g. GWFout)
+# Output formats for fetched rows: name -> (file extension, TimeSeries.write keyword arguments). GWF
+# compression goes through the frameCPP writer; HDF5 options are passed on to h5py's create_dataset.
+# Only GWF rows are listed in fin.ffl, since Omicron reads frame files.
+OUTPUT_CODECS = {
+    "gwf": (".gwf", {"format": "gwf"}),
+    "gwf-gzip-1": (".gwf", {"format": "gwf", "compression": "GZIP", "compression_level": 1}),
+    "gwf-gzip-6": (".gwf", {"format": "gwf", "compression": "GZIP", "compression_level": 6}),
+    "gwf-gzip-9": (".gwf", {"format": "gwf", "compression": "GZIP", "compression_level": 9}),
+    "gwf-zero-suppress": (".gwf", {"format": "gwf", "compression": "ZERO_SUPPRESS_OTHERWISE_GZIP", "compression_level": 6}),
+    "hdf5": (".h5", {"format": "hdf5", "compression": None, "overwrite": True}),
+    "hdf5-gzip-4": (".h5", {"format": "hdf5", "compression": "gzip", "compression_opts": 4, "chunks": True,
+                            "shuffle": True, "overwrite": True}),
+    "hdf5-lzf": (".h5", {"format": "hdf5", "compression": "lzf", "chunks": True, "shuffle": True, "overwrite": True}),
+}
+DEFAULT_OUTPUT_CODEC = "gwf"
+EXPORT_DIR = "export"  # Memory-mappable .npy export, next to the segment directories of each channel
+BENCHMARK_REPEATS = 3
+METADATA_PREFETCH_DELAY_MS = 2000  # Background metadata prefetch starts this long after the window opens
+NDS_AVAILABILITY_FILE = "gravfetch_availability.json"
+NDS_AVAILABILITY_WINDOW = (1238112018, 1238198418)  # Availability window used when no custom GPS times are given
+
 DEFAULT_CONFIG = """\
 DATA CHANNELS\tNo Channels Available
 DATA FFL\t
@@ -286,12 +369,1636 @@ class MainWindow(QMainWindow):
             message
         )
 
+########################################################################################################################################
+##########################################################    FETCH ENGINE    ##########################################################
+########################################################################################################################################
+
+def url_host(url):
+    # osdf:///namespace/... URLs carry no netloc, so fall back to the scheme
+    parsed = urlparse(url)
+    return parsed.netloc or parsed.scheme or "local"
+
+class HostLimiter:
+    # Caps the number of simultaneous transfers against any one host. Semaphores belong to the event loop
+    # that first uses them, so create one limiter per job from inside that job's coroutine.
+    def __init__(self, max_per_host=OSDF_MAX_PER_HOST):
+        self.max_per_host = max(1, int(max_per_host))
+        self._semaphores = {}
+
+    def slot(self, url):
+        # Key on the cache server the director redirected this namespace to, so osdf:/// URLs served by
+        # different caches get separate caps; unresolved namespaces share the director's slot until then
+        host = url_host(OSDF_SESSIONS.resolve(url))
+        if host not in self._semaphores:
+            self._semaphores[host] = asyncio.Semaphore(self.max_per_host)
+        return self._semaphores[host]
+
+class OSDFSessionPool:
+    # Keep-alive sessions shared by every OSDF transfer across segments and jobs. A session is checked out for
+    # the lifetime of one response, so concurrent workers never share a session mid-stream. The cache server the
+    # Pelican director redirects to is remembered per namespace, letting later files skip the director lookup.
+    def __init__(self, pool_size=OSDF_POOL_SIZE):
+        self.pool_size = pool_size
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._redirects = {}  # {(scheme, netloc, namespace): cache base URL}
+
+    def _new_session(self):
+        session = rp.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    @contextmanager
+    def session(self):
+        try:
+            session = self._idle.get_nowait()
+        except queue.Empty:
+            session = self._new_session()
+        try:
+            yield session
+        finally:
+            self._idle.put(session)
+
+    def _namespace(self, url):
+        parsed = urlparse(url)
+        parts = [p for p in parsed.path.split("/") if p]
+        return (parsed.scheme, parsed.netloc, parts[0] if parts else "")
+
+    def resolve(self, url):
+        parsed = urlparse(url)
+        if parsed.scheme not in ("osdf", "pelican"):
+            return url
+        with self._lock:
+            base = self._redirects.get(self._namespace(url))
+        return f"{base}{parsed.path}" if base else url
+
+    def remember(self, url, response):
+        parsed = urlparse(url)
+        final = urlparse(response.url)
+        if parsed.scheme not in ("osdf", "pelican") or final.scheme not in ("http", "https"):
+            return
+        if not final.path.endswith(parsed.path):
+            return
+        base = f"{final.scheme}://{final.netloc}{final.path[:len(final.path) - len(parsed.path)]}"
+        with self._lock:
+            self._redirects[self._namespace(url)] = base
+
+    def forget(self, url):
+        with self._lock:
+            self._redirects.pop(self._namespace(url), None)
+
+    @contextmanager
+    def stream(self, url, **kwargs):
+        kwargs.setdefault("stream", True)
+        with self.session() as session:
+            target = self.resolve(url)
+            response = None
+            if target != url:
+                try:
+                    response = session.get(target, **kwargs)
+                    if response.status_code >= 500 or response.status_code in (403, 404):
+                        response.close()
+                        response = None
+                except RequestException:
+                    response = None
+                if response is None:
+                    # The cached cache server went away; ask the director again
+                    self.forget(url)
+            if response is None:
+                response = session.get(url, **kwargs)
+                if response.ok:
+                    self.remember(url, response)
+            try:
+                yield response
+            finally:
+                response.close()
+
+OSDF_SESSIONS = OSDFSessionPool()
+# Public datafind lookups reuse the same keep-alive pooling (rp.Session is a plain requests.Session for https)
+DATAFIND_SESSIONS = OSDFSessionPool()
+
+def datafind_call(fn, *args, **kwargs):
+    # Run a gwdatafind query (find_types, find_times, find_urls) in-process on a pooled session
+    with DATAFIND_SESSIONS.session() as session:
+        return fn(*args, session=session, **kwargs)
+
+class TokenBucket:
+    # Classic token bucket with additive increase / multiplicative decrease of its refill rate
+    def __init__(self, rate, burst, min_rate, max_rate):
+        self.base_rate = float(rate)
+        self.rate = float(rate)
+        self.burst = max(1.0, float(burst))
+        self.min_rate = float(min_rate)
+        self.max_rate = max(float(max_rate), self.rate)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self):
+        # Take a token if one is available, otherwise return how long to wait for the next one
+        with self.lock:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    def success(self):
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.base_rate * 0.1)
+
+    def failure(self):
+        with self.lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = min(self.tokens, 0.0)
+
+class RateLimiter:
+    # One token bucket per endpoint plus the shared retry/backoff policy used by every fetch path
+    def __init__(self, limits=None):
+        self.limits = dict(DEFAULT_RATE_LIMITS)
+        self.limits.update(limits or {})
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, host):
+        host = host or "default"
+        with self._lock:
+            if host not in self._buckets:
+                conf = dict(self.limits["default"])
+                conf.update(self.limits.get(host, {}))
+                self._buckets[host] = TokenBucket(conf["rate"], conf["burst"], conf["min_rate"], conf["max_rate"])
+            return self._buckets[host]
+
+    def acquire(self, host, should_continue=None):
+        # Blocks until the host has a free token; returns False if should_continue() turns False meanwhile
+        bucket = self.bucket(host)
+        while True:
+            delay = bucket.reserve()
+            if delay <= 0:
+                return True
+            if not self.sleep(min(delay, 1.0), should_continue):
+                return False
+
+    def success(self, host):
+        self.bucket(host).success()
+
+    def failure(self, host):
+        self.bucket(host).failure()
+
+    def backoff_delay(self, attempt, base=BACKOFF_BASE, cap=BACKOFF_CAP):
+        # Exponential backoff with "equal jitter": half the window is fixed, half is random
+        window = min(cap, base * (2 ** attempt))
+        return window / 2 + random.uniform(0, window / 2)
+
+    def backoff(self, attempt, should_continue=None, base=BACKOFF_BASE, cap=BACKOFF_CAP):
+        return self.sleep(self.backoff_delay(attempt, base, cap), should_continue)
+
+    async def wait(self, host, should_continue=None):
+        # Event-loop flavour of acquire()
+        bucket = self.bucket(host)
+        while True:
+            delay = bucket.reserve()
+            if delay <= 0:
+                return True
+            if not await self.sleep_async(min(delay, 1.0), should_continue):
+                return False
+
+    async def backoff_async(self, attempt, should_continue=None, base=BACKOFF_BASE, cap=BACKOFF_CAP):
+        return await self.sleep_async(self.backoff_delay(attempt, base, cap), should_continue)
+
+    async def sleep_async(self, seconds, should_continue=None):
+        deadline = time.monotonic() + seconds
+        while True:
+            if should_continue is not None and not should_continue():
+                return False
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return True
+            await asyncio.sleep(min(remaining, 0.5))
+
+    def sleep(self, seconds, should_continue=None):
+        deadline = time.monotonic() + seconds
+        while True:
+            if should_continue is not None and not should_continue():
+                return False
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return True
+            time.sleep(min(remaining, 0.5))
+
+def load_rate_limits(path=RATE_LIMITS_FILE):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r") as f:
+            limits = json.load(f)
+        if not isinstance(limits, dict):
+            raise ValueError("expected a JSON object of {host: limits}")
+        return limits
+    except Exception as e:
+        logging.warning(f"Ignoring rate limit overrides in {path}: {e}")
+        return {}
+
+RATE_LIMITER = RateLimiter(load_rate_limits())
+
+class FetchCore:
+    # One asyncio event loop drives every fetch path. The GUI submits jobs to a loop running on a background
+    # thread and hears back through Qt signals; the CLI runs the same coroutines natively with asyncio.run.
+    # gwdatafind, gwpy and requests are blocking libraries, so their calls are parked on a shared executor and
+    # the loop only coordinates: hundreds of lookups and transfers can be in flight from a single thread.
+    def __init__(self, max_workers=FETCH_MAX_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gweasy-fetch")
+        self.loop = None
+        self._thread = None
+        self._processes = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self.loop is None:
+                self.loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._run_loop, name="gweasy-fetch-loop", daemon=True)
+                self._thread.start()
+            return self.loop
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro):
+        # GUI entry point: returns a concurrent.futures.Future and never blocks the Qt thread
+        return asyncio.run_coroutine_threadsafe(coro, self.start())
+
+    def run(self, coro):
+        # CLI entry point: runs the coroutine to completion on the calling thread
+        return asyncio.run(coro)
+
+    async def call(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(fn, *args, **kwargs))
+
+    def process_pool(self):
+        with self._lock:
+            if self._processes is None:
+                # Spawned, not forked: this process runs Qt, the loop thread, the executor threads and open SQLite
+                # connections, and a fork taken while any of them holds a lock can deadlock the child
+                self._processes = ProcessPoolExecutor(max_workers=NDS_MAX_PROCESSES,
+                                                      mp_context=multiprocessing.get_context("spawn"))
+            return self._processes
+
+    async def call_in_process(self, fn, *args):
+        # fn and its arguments must be picklable (module-level function, plain values)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.process_pool(), fn, *args)
+
+FETCH_CORE = FetchCore()
+
+def cli_log(message, level="info"):
+    color = {"error": COLORS["red"], "success": COLORS["green"], "warning": COLORS["yellow"], "info": COLORS["blue"]}.get(level, "")
+    print(f"{color}{message}{COLORS['reset']}")
+    logging.log(
+        {"error": logging.ERROR, "success": logging.INFO, "warning": logging.WARNING, "info": logging.INFO}[level],
+        message
+    )
+
+def fetch_nds_channels(channels, start, end, host=NDS_HOST):
+    # Every channel for one stretch over a single NDS2 connection. Module level so it can be shipped to a
+    # worker process.
+    return TimeSeriesDict.fetch(channels, start=start, end=end, host=host)
+
+def split_chunks(start, end, chunk_seconds=FETCH_CHUNK_SECONDS):
+    if not chunk_seconds or end - start <= chunk_seconds:
+        return [(start, end)]
+    return [(t, min(t + chunk_seconds, end)) for t in range(start, end, chunk_seconds)]
+
+def split_at_frames(key, query, start, end, chunk_seconds=FETCH_CHUNK_SECONDS):
+    # Chunk boundaries for a source that reads frame files: cut only at the file edges URL_CACHE knows for key,
+    # so no frame is opened and decompressed by more than one chunk. Consecutive files are grouped until a
+    # chunk reaches chunk_seconds.
+    bounds = [start]
+    for t in sorted({t for url in URL_CACHE.resolve(key, start, end, query) for t in frame_file_span(url) or ()}):
+        if start < t < end and t - bounds[-1] >= chunk_seconds:
+            bounds.append(t)
+    bounds.append(end)
+    return list(zip(bounds, bounds[1:]))
+
+def stitch_chunks(parts):
+    # Chunks arrive in GPS order; raises ValueError when two of them do not meet, since padding the hole
+    # would write made-up samples into a frame that claims to cover it
+    data = parts[0]
+    for part in parts[1:]:
+        data = data.append(part, inplace=False, gap="raise")
+    return data
+
+def plan_segments(segments, max_gap=SEGMENT_MERGE_GAP):
+    # Normalise a list of "start_end" rows before fetching: drop zero-length and duplicate rows, sort, and
+    # merge overlapping rows and rows separated by at most max_gap seconds into single fetches.
+    # Returns (fetches, invalid): fetches is a list of (start, end, rows) in GPS order where rows are the
+    # (start, end) rows each merged fetch covers; invalid holds (segment, error) for unparsable rows.
+    rows, invalid = set(), []
+    for seg in segments:
+        try:
+            start, end = map(int, seg.split("_"))
+        except ValueError as e:
+            invalid.append((seg, e))
+            continue
+        if end > start:
+            rows.add((start, end))
+    fetches = []
+    for start, end in sorted(rows):
+        if fetches and start - fetches[-1][1] <= max_gap:
+            fetches[-1][1] = max(fetches[-1][1], end)
+            fetches[-1][2].append((start, end))
+        else:
+            fetches.append([start, end, [(start, end)]])
+    return [tuple(f) for f in fetches], invalid
+
+def describe_plan(segments, fetches, sample_rate=None):
+    # Summary of what planning saved and cost: round-trips, GPS seconds the requested rows would have fetched
+    # more than once, and gap seconds between merged rows that are fetched although nobody asked for them
+    # (bytes when the rate is known)
+    requested = sum(end - start for start, end in (map(int, seg.split("_")) for seg in segments
+                                                    if re.fullmatch(r"\d+_\d+", seg)))
+    fetched = sum(end - start for start, end, _ in fetches)
+    covered = sum(end - start for start, end in merge_intervals(row for _, _, rows in fetches for row in rows))
+    saved_seconds = max(0, requested - covered)
+    gap_seconds = max(0, fetched - covered)
+
+    def amount(seconds):
+        return f"~{seconds * float(sample_rate) * 8 / 1e6:.1f} MB" if sample_rate else f"{seconds} s"
+
+    return (f"Planned {len(fetches)} fetches for {len(segments)} requested segments ({len(segments) - len(fetches)} "
+            f"requests saved, {amount(saved_seconds)} not refetched, {amount(gap_seconds)} of gaps fetched)")
+
+def write_output(data, path, codec=DEFAULT_OUTPUT_CODEC):
+    data.write(path, **OUTPUT_CODECS[codec][1])
+
+def hdf5_datasets(path):
+    # Dataset paths in an HDF5 file, in storage order; gwpy writes a TimeSeries as a dataset named after its channel
+    names = []
+    with h5py.File(path, "r") as f:
+        f.visititems(lambda name, obj: names.append(name) if isinstance(obj, h5py.Dataset) else None)
+    return names
+
+def load_sample(path, channel=None):
+    # One channel out of a frame (or HDF5) file to benchmark with; the first channel (or dataset) in the file
+    # by default
+    if channel is None:
+        names = hdf5_datasets(path) if h5py.is_hdf5(path) else get_channel_names(path)
+        if not names:
+            raise ValueError(f"No channels found in {path}")
+        channel = names[0]
+    return TimeSeries.read(path, channel)
+
+def benchmark_codecs(data, codecs=None, repeats=BENCHMARK_REPEATS):
+    # Write and read data back with each output codec. Returns one dict per codec with write throughput
+    # (raw MB/s), compression ratio (raw bytes / file bytes) and read time, best of repeats; a codec the
+    # installed writer does not support reports its error instead.
+    raw_bytes = data.value.nbytes
+    results = []
+    workdir = tempfile.mkdtemp(prefix="gweasy_bench_")
+    try:
+        for codec in codecs or OUTPUT_CODECS:
+            path = os.path.join(workdir, f"sample{OUTPUT_CODECS[codec][0]}")
+            try:
+                write_times, read_times = [], []
+                for _ in range(repeats):
+                    if os.path.exists(path):
+                        os.remove(path)
+                    t0 = time.perf_counter()
+                    write_output(data, path, codec)
+                    write_times.append(time.perf_counter() - t0)
+                    t0 = time.perf_counter()
+                    TimeSeries.read(path, str(data.name))
+                    read_times.append(time.perf_counter() - t0)
+                size = os.path.getsize(path)
+                results.append({"codec": codec, "size": size, "ratio": raw_bytes / size if size else 0.0,
+                                "write_mb_s": raw_bytes / 1e6 / max(min(write_times), 1e-9),
+                                "read_s": min(read_times), "error": None})
+            except Exception as e:
+                results.append({"codec": codec, "size": 0, "ratio": 0.0, "write_mb_s": 0.0, "read_s": 0.0,
+                                "error": str(e)})
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+def format_benchmark(results):
+    lines = [f"{'codec':<20}{'size (MB)':>11}{'ratio':>8}{'write MB/s':>12}{'read (s)':>10}"]
+    for r in results:
+        if r["error"]:
+            lines.append(f"{r['codec']:<20}  failed: {r['error']}")
+        else:
+            lines.append(f"{r['codec']:<20}{r['size'] / 1e6:>11.2f}{r['ratio']:>8.2f}{r['write_mb_s']:>12.1f}{r['read_s']:>10.3f}")
+    return lines
+
+async def fetch_channel_segments(channels, segments, out_root, fetch_data, log, should_continue=lambda: True,
+                                 host="default", concurrency=SEGMENT_CONCURRENCY, max_retries=None, on_error=None,
+                                 use_processes=False, chunk_seconds=FETCH_CHUNK_SECONDS, merge_gap=SEGMENT_MERGE_GAP,
+                                 sample_rate=None, frametype=None, codecs=None, export=False, split_span=None,
+                                 refetch=False):
+    # Shared segment loop for the NDS, Assoc and CLI paths. fetch_data(channels, start, end) is a blocking call
+    # returning {channel: TimeSeries} for the requested channels (or None when there is nothing to fetch), so
+    # a source that reads several channels out of the same frames (TimeSeriesDict.read) does that I/O once
+    # for all of them. It runs on FETCH_CORE's executor, or in the process pool when use_processes is set.
+    # Rows any channel still lacks are planned with plan_segments, each merged span is fetched once (in
+    # chunks that run and retry independently: split_span(start, end) gives a blocking source's chunk
+    # boundaries, fixed chunks of chunk_seconds are used otherwise) for the channels that need it, and cropped
+    # back into each channel's per-row files, written with that channel's entry in codecs (an OUTPUT_CODECS
+    # name, DEFAULT_OUTPUT_CODEC otherwise). Each span writes its own rows as soon as it arrives, and at most
+    # concurrency spans are in flight. Frame writes and fin.ffl updates always happen here in the parent,
+    # one at a time, through each channel's FrameList. With export set, every row of every channel
+    # is also kept in that channel's ChannelExport, including rows fetched by earlier runs. With refetch set,
+    # rows already on disk are fetched again and overwritten.
+    channels = list(dict.fromkeys(channels))
+    codecs = {ch: (codecs or {}).get(ch) or DEFAULT_OUTPUT_CODEC for ch in channels}
+    name = channels[0] if len(channels) == 1 else f"{len(channels)} channels"
+    ch_dirs = {ch: os.path.join(out_root, ch.replace(":", "_")) for ch in channels}
+    for ch_dir in ch_dirs.values():
+        os.makedirs(ch_dir, exist_ok=True)
+    frames = {ch: FrameList.open(os.path.join(ch_dirs[ch], "fin.ffl")) for ch in channels}
+    exports = {ch: ChannelExport.open(ch_dirs[ch]) for ch in channels} if export else {}
+    slots = asyncio.Semaphore(max(1, concurrency))
+    writes = asyncio.Lock()
+    inventory = Inventory.open(out_root)
+    await FETCH_CORE.call(inventory.refresh)  # so files copied in since the last run count as fetched
+
+    async def fetch_chunk(chs, start, end, label, retries):
+        # Returns (ok, data); data is None when the source has nothing for this stretch. retries=None retries
+        # until should_continue() turns false.
+        chs_name = chs[0] if len(chs) == 1 else f"{len(chs)} channels"
+        async with slots:
+            attempt = 0
+            while should_continue():
+                if not await RATE_LIMITER.wait(host, should_continue):
+                    break
+                try:
+                    log(f"Fetching {chs_name} from {start} to {end}{label}...", "info")
+                    if use_processes:
+                        data = await FETCH_CORE.call_in_process(fetch_data, chs, start, end)
+                    else:
+                        data = await FETCH_CORE.call(fetch_data, chs, start, end)
+                    RATE_LIMITER.success(host)
+                    return True, data
+                except (ValueError, RuntimeError, OSError) as e:
+                    log(f"Error fetching {chs_name} {start}-{end}: {e}", "error")
+                    RATE_LIMITER.failure(host)
+                    attempt += 1
+                    if retries is not None and attempt >= retries:
+                        log(f"Max retries reached for {chs_name} {start}-{end}", "error")
+                        return False, None
+                    if not should_continue():
+                        break
+                    if on_error is not None:
+                        await FETCH_CORE.call(on_error, chs_name, start, end)
+                    await RATE_LIMITER.backoff_async(attempt - 1, should_continue)
+                except Exception as e:
+                    log(f"Unexpected error fetching {chs_name} {start}-{end}: {e}\n{traceback.format_exc()}", "error")
+                    return False, None
+            return False, None
+
+    def row_outfile(ch, start, end):
+        extension = OUTPUT_CODECS[codecs[ch]][0]
+        return os.path.join(ch_dirs[ch], f"{start}_{end}", f"{ch.replace(':','_')}_{start}_{end}{extension}")
+
+    def add_frame(ch, outfile, start, duration):
+        if outfile.endswith(".gwf"):
+            frames[ch].add(outfile, start, duration)
+
+    async def fetch_span(chs, start, end, retries):
+        # Fetch one merged span, chunked. Returns (ok, {channel: stitched series}); ok is False when a chunk
+        # failed or a channel's chunks leave a hole, and the dict is None when nothing came back.
+        chunks = split_chunks(start, end, chunk_seconds)
+        if split_span is not None:
+            try:
+                chunks = await FETCH_CORE.call(split_span, start, end)
+            except Exception as e:
+                log(f"Could not find chunk boundaries for {start}-{end} ({e}); fetching it in one piece", "warning")
+                chunks = [(start, end)]
+        n = len(chunks)
+        chunk_tasks = [asyncio.ensure_future(fetch_chunk(chs, cs, ce, f" (chunk {i}/{n})" if n > 1 else "", retries))
+                       for i, (cs, ce) in enumerate(chunks, 1)]
+        parts = {ch: [] for ch in chs}
+        try:
+            for (cs, ce), task in zip(chunks, chunk_tasks):
+                ok, part = await task
+                if not ok:
+                    return False, None
+                for ch in chs:
+                    if part is not None and part.get(ch) is not None:
+                        parts[ch].append(part[ch])
+                    elif n > 1:
+                        log(f"No data for {ch} {cs}-{ce}", "warning")
+                del part
+        finally:
+            for task in chunk_tasks:
+                task.cancel()
+        stitched = {}
+        for ch in chs:
+            if not parts[ch]:
+                log(f"No data available for {ch} {start}-{end}. Skipping.", "warning")
+                continue
+            try:
+                data = parts[ch][0] if len(parts[ch]) == 1 else await FETCH_CORE.call(stitch_chunks, parts[ch])
+            except ValueError as e:
+                # A hole inside the span fails it like a chunk that ran out of retries; a merged span then
+                # falls back to one fetch per row
+                log(f"Gap inside {ch} {start}-{end} ({e}); not writing it", "error")
+                return False, None
+            data_start, data_end = (float(t) for t in data.span)
+            if data_start > start:
+                log(f"Gap in coverage for {ch}: {start} to {data_start:g}", "warning")
+            if data_end < end:
+                log(f"Gap in coverage for {ch}: {data_end:g} to {end}", "warning")
+            stitched[ch] = data
+        return True, stitched or None
+
+    async def write_row(ch, data, start, end, whole):
+        # Crop the merged fetch back to one requested row and write it to that row's directory
+        outfile = row_outfile(ch, start, end)
+        data_start, data_end = (float(t) for t in data.span)
+        if data_end <= start or data_start >= end:
+            log(f"No data available for {ch} {start}-{end}. Skipping.", "warning")
+            return None
+        try:
+            os.makedirs(os.path.dirname(outfile), exist_ok=True)
+            if os.path.lexists(outfile):
+                os.remove(outfile)  # refetched, or left over from a run that never indexed it
+            row = data if whole else data.crop(max(start, data_start), min(end, data_end), copy=True)
+            row_start, row_end = (float(t) for t in row.span)
+            async with writes:
+                await FETCH_CORE.call(write_output, row, outfile, codecs[ch])
+                await FETCH_CORE.call(inventory.record, outfile, ch, row_start, row_end, frametype, host)
+                if export:
+                    await FETCH_CORE.call(exports[ch].add, row)
+        except Exception as e:
+            log(f"Error writing {outfile}: {e}\n{traceback.format_exc()}", "error")
+            if os.path.exists(outfile):
+                os.remove(outfile)
+                inventory.remove(outfile)
+                log(f"Deleted interrupted file: {outfile}", "info")
+            return None
+        saved_size = os.path.getsize(outfile)
+        log(f"Saved: {outfile} ({saved_size} bytes)", "success")
+        return outfile, row_start, row_end - row_start
+
+    pending = []
+    needed = {}  # (start, end) -> channels still missing that row
+    unexported = []  # (channel, file) already on disk but not yet in the channel's export
+    for seg in segments:
+        try:
+            start, end = map(int, seg.split("_"))
+        except ValueError:
+            pending.append(seg)  # reported by the planner
+            continue
+        for ch in channels:
+            outfile = row_outfile(ch, start, end)
+            span = None if refetch else inventory.span(outfile)
+            if span is not None:
+                add_frame(ch, outfile, span[0], span[1] - span[0])  # no-op unless fin.ffl lost it
+                if export and not exports[ch].has(*span):
+                    unexported.append((ch, outfile))
+                log(f"Segment {seg} already fetched for {ch}. Skipping.", "info")
+                continue
+            if (start, end) not in needed:
+                needed[(start, end)] = []
+                pending.append(seg)
+            if ch not in needed[(start, end)]:
+                needed[(start, end)].append(ch)
+    for ch, outfile in unexported:
+        try:
+            data = await FETCH_CORE.call(TimeSeries.read, outfile, ch)
+            await FETCH_CORE.call(exports[ch].add, data)
+            log(f"Exported {outfile} to {exports[ch].path}", "info")
+        except Exception as e:
+            log(f"Error exporting {outfile}: {e}\n{traceback.format_exc()}", "error")
+    fetches, invalid = plan_segments(pending, merge_gap)
+    for seg, e in invalid:
+        log(f"Invalid segment format {seg}: {e}", "error")
+    if not fetches:
+        for ch_frames in frames.values():
+            ch_frames.flush()
+        return 0
+    log(describe_plan(pending, fetches, sample_rate), "info")
+
+    async def fetch_rows(start, end, rows):
+        # Fetch one planned span; a merged span only gets a few attempts, since merged rows can straddle
+        # missing data that makes the whole request fail, and then falls back to one fetch per row
+        chs = [ch for ch in channels if any(ch in needed[row] for row in rows)]
+        if len(rows) == 1:
+            return [((start, end), rows, (await fetch_span(chs, start, end, max_retries))[1])]
+        retries = MERGED_SPAN_RETRIES if max_retries is None else min(max_retries, MERGED_SPAN_RETRIES)
+        ok, data = await fetch_span(chs, start, end, retries)
+        if ok or not should_continue():
+            return [((start, end), rows, data)]
+        log(f"Merged fetch {start}_{end} for {name} failed; fetching its {len(rows)} segments one by one", "warning")
+        return [(row, [row], (await fetch_span(needed[row], row[0], row[1], max_retries))[1]) for row in rows]
+
+    # The window keeps at most that many spans (and their fetched data) in memory, whatever order they finish in
+    window = asyncio.Semaphore(max(1, concurrency))
+
+    async def process_span(span_start, span_end, rows):
+        async with window:
+            written = 0
+            for (fetched_start, fetched_end), fetched_rows, data in await fetch_rows(span_start, span_end, rows):
+                if data is None:
+                    continue
+                for start, end in fetched_rows:
+                    for ch in needed[(start, end)]:
+                        if ch not in data:
+                            continue
+                        result = await write_row(ch, data[ch], start, end, (start, end) == (fetched_start, fetched_end))
+                        if result is None:
+                            continue
+                        add_frame(ch, *result)
+                        written += 1
+                del data
+            return written
+
+    tasks = [asyncio.ensure_future(process_span(start, end, rows)) for start, end, rows in fetches]
+    saved = 0
+    try:
+        for (span_start, span_end, _), task in zip(fetches, tasks):
+            try:
+                saved += await task
+            except Exception as e:
+                log(f"Error processing {span_start}_{span_end} for {name}: {e}\n{traceback.format_exc()}", "error")
+    finally:
+        for task in tasks:
+            task.cancel()
+        for ch_frames in frames.values():
+            ch_frames.flush()
+    return saved
+
+def load_json_cache(path, default_ttl):
+    # Returns (ttl, entries); a missing or unreadable cache is just empty
+    if not os.path.exists(path):
+        return default_ttl, {}
+    try:
+        with open(path, "r") as f:
+            cache = json.load(f)
+        return float(cache.get("ttl", default_ttl)), dict(cache.get("entries", {}))
+    except Exception as e:
+        logging.warning(f"Ignoring unreadable cache {path}: {e}")
+        return default_ttl, {}
+
+def save_json_cache(path, ttl, entries):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"ttl": ttl, "entries": entries}, f, indent=4)
+    os.replace(tmp_path, path)
+
+def cache_entry_fresh(entry, ttl):
+    return entry is not None and time.time() - entry.get("fetched", 0) < ttl
+
+def glob_to_regex(pattern):
+    # fnmatch-style pattern matched against one line of a newline-separated name table
+    parts = []
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        j = pattern.find("]", i + 2)
+        if c == "*":
+            parts.append("[^\n]*")
+        elif c == "?":
+            parts.append("[^\n]")
+        elif c == "[" and j != -1:
+            body = pattern[i + 1:j].replace("\\", "\\\\")
+            parts.append(f"[^\n{body[1:]}]" if body.startswith("!") else f"[{body}]")
+            i = j
+        else:
+            parts.append(re.escape(c))
+        i += 1
+    # A leading * needs no anchor, which lets re jump straight to the first literal
+    anchor = "" if parts and parts[0] == "[^\n]*" else "^"
+    return re.compile((anchor + "".join(parts[1:] if not anchor else parts) + "$").encode("utf-8"), re.MULTILINE)
+
+class ChannelTable:
+    # One detector's channel listing, column-wise: every name in a single UTF-8 string table (names), n+1
+    # offsets into it and a float64 rate per channel. Names are sorted, so the table doubles as a sequence
+    # for bisect without materialising a Python list. order lists channel indices grouped by subsystem
+    # (name order within a group) and group_ranges maps each subsystem to its slice of order.
+    def __init__(self, names, offsets, rates, order=None, group_ranges=None):
+        self.names = names
+        self.offsets = offsets
+        self.rates = rates
+        self._text = None
+        self._ends = None
+        if order is None:
+            order, group_ranges = build_group_index(self.names_at(np.arange(len(self))))
+        self.order = order
+        self.group_ranges = group_ranges
+
+    def __len__(self):
+        return len(self.rates)
+
+    def __getitem__(self, i):
+        return bytes(self.names[self.offsets[i]:self.offsets[i + 1]]).decode("utf-8")
+
+    def find(self, name):
+        i = bisect.bisect_left(self, name)
+        return i if i < len(self) and self[i] == name else None
+
+    def prefix_range(self, prefix):
+        return bisect.bisect_left(self, prefix), bisect.bisect_left(self, prefix + "\U0010ffff")
+
+    def group(self, group):
+        lo, hi = self.group_ranges.get(group, (0, 0))
+        return self.order[lo:hi]
+
+    def _line_text(self):
+        # The string table with a newline after each name, built once so substring and glob searches run
+        # inside bytes.find / re rather than a Python loop over every channel
+        if self._text is None:
+            n = len(self)
+            ends = np.asarray(self.offsets[1:], dtype=np.int64) + np.arange(n, dtype=np.int64)
+            text = np.empty(len(self.names) + n, dtype=np.uint8)
+            keep = np.ones(len(text), dtype=bool)
+            keep[ends] = False
+            text[keep] = self.names
+            text[ends] = ord("\n")
+            self._ends = ends
+            self._text = text.tobytes()
+        return self._text, self._ends
+
+    def names_at(self, indices):
+        # Batch decode through the in-memory line table; far cheaper than slicing the mapped array per name
+        text, _ = self._line_text()
+        indices = np.asarray(indices, dtype=np.int64)
+        starts = (np.asarray(self.offsets)[indices] + indices).tolist()
+        stops = (np.asarray(self.offsets)[indices + 1] + indices).tolist()
+        return [text[a:b].decode("utf-8") for a, b in zip(starts, stops)]
+
+    def search(self, query, limit=NDS_SEARCH_LIMIT):
+        # Channel indices matching query in name order: a glob when it has wildcards, a prefix when it starts
+        # with "IFO:", otherwise a substring (also tried upper-cased, as channel names are)
+        if not query or not len(self):
+            return []
+        if any(c in query for c in "*?["):
+            # Only the lines sharing the pattern's literal prefix are scanned
+            lo, hi = self.prefix_range(re.split(r"[*?\[]", query, 1)[0])
+            if lo >= hi:
+                return []
+            text, ends = self._line_text()
+            pattern = glob_to_regex(query)
+            matches = pattern.finditer(text, int(self.offsets[lo]) + lo, int(ends[hi - 1]) + 1)
+            starts = [m.start() for _, m in zip(range(limit), matches)]
+            return np.searchsorted(ends, starts).tolist()
+        if re.match(r"^[A-Z0-9]+:", query):
+            lo, hi = self.prefix_range(query)
+            return list(range(lo, min(hi, lo + limit)))
+        text, ends = self._line_text()
+        hits = set()
+        for needle in dict.fromkeys((query, query.upper())):
+            # Each match runs on to the end of its line, so one hit per channel
+            pattern = re.compile(re.escape(needle.encode("utf-8")) + b"[^\n]*")
+            starts = [m.start() for _, m in zip(range(limit), pattern.finditer(text))]
+            hits.update(np.searchsorted(ends, starts).tolist())
+        return sorted(hits)[:limit]
+
+def build_group_index(names):
+    # names in sorted order -> (order, {group: [lo, hi]}) for ChannelTable
+    groups = []
+    for name in names:
+        match = ChannelCatalog.CHANNEL_PATTERN.match(name)
+        groups.append(match.group(2) if match else "")
+    labels = sorted(set(groups))
+    label_ids = {g: k for k, g in enumerate(labels)}
+    ids = np.array([label_ids[g] for g in groups], dtype=np.int32)
+    order = np.argsort(ids, kind="stable").astype(np.int32)
+    bounds = np.searchsorted(ids[order], np.arange(len(labels) + 1))
+    return order, {g: [int(bounds[k]), int(bounds[k + 1])] for k, g in enumerate(labels)}
+
+class ChannelCatalog:
+    # Persistent NDS channel catalog. Each detector sync is written to its own version directory
+    # (<root>/<det>/<version>/{names,offsets,rates}.npy) and only then published in meta.json, which records
+    # when every detector was last synced and its subsystem groups. Tables are opened with mmap_mode="r", so
+    # loading even the full H1 listing costs milliseconds, and detectors are refreshed one at a time.
+    CHANNEL_PATTERN = re.compile(r'^(H1|L1|V1|K1):([A-Z]+)-?.*')
+
+    def __init__(self, root=NDS_CATALOG_DIR, default_ttl=NDS_CATALOG_TTL):
+        self.root = root
+        self.meta_path = os.path.join(root, "meta.json")
+        self.ttl, self.meta = load_json_cache(self.meta_path, default_ttl)
+        self._tables = {}
+        self._lock = threading.Lock()
+
+    def load(self, det_code):
+        table = self._tables.get(det_code)
+        if table is not None:
+            return table
+        entry = self.meta.get(det_code)
+        if entry is None:
+            return None
+        version_dir = os.path.join(self.root, det_code, entry["version"])
+        mmap_mode = "r" if entry.get("count") else None  # empty arrays cannot be memory-mapped
+        try:
+            columns = [np.load(os.path.join(version_dir, f"{column}.npy"), mmap_mode=mmap_mode)
+                       for column in ("names", "offsets", "rates")]
+            if "group_ranges" in entry:
+                columns += [np.load(os.path.join(version_dir, "order.npy"), mmap_mode=mmap_mode), entry["group_ranges"]]
+            table = ChannelTable(*columns)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable channel catalog for {det_code}: {e}")
+            return None
+        self._tables[det_code] = table
+        return table
+
+    def fresh(self, det_code):
+        return cache_entry_fresh(self.meta.get(det_code), self.ttl)
+
+    def synced(self, det_code):
+        entry = self.meta.get(det_code)
+        return entry["fetched"] if entry else None
+
+    def groups(self, det_code):
+        entry = self.meta.get(det_code)
+        return entry.get("groups", []) if entry else []
+
+    def channels(self, det_code, indices=None):
+        # [(name, rate)] for the given channel indices, or the whole detector
+        table = self.load(det_code)
+        if table is None:
+            return []
+        indices = np.arange(len(table)) if indices is None else np.asarray(indices, dtype=np.int64)
+        return list(zip(table.names_at(indices), np.asarray(table.rates)[indices].tolist()))
+
+    def group_channels(self, det_code, group):
+        table = self.load(det_code)
+        return self.channels(det_code, table.group(group)) if table is not None else []
+
+    def search(self, det_code, query, limit=NDS_SEARCH_LIMIT):
+        table = self.load(det_code)
+        return self.channels(det_code, table.search(query, limit)) if table is not None else []
+
+    def rate(self, channel):
+        table = self.load(channel.split(":")[0])
+        i = table.find(channel) if table is not None else None
+        return float(table.rates[i]) if i is not None else None
+
+    def store(self, det_code, channels):
+        # channels: iterable of (name, sample_rate) as returned by an NDS2 listing
+        listing = {}
+        groups = set()
+        for name, rate in channels:
+            match = self.CHANNEL_PATTERN.match(name)
+            if match:
+                listing[name] = float(rate)
+                groups.add(match.group(2))
+        names = sorted(listing)
+        encoded = [name.encode("utf-8") for name in names]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        order, group_ranges = build_group_index(names)
+        columns = {
+            "names": np.frombuffer(b"".join(encoded), dtype=np.uint8),
+            "offsets": offsets,
+            "rates": np.array([listing[name] for name in names], dtype=np.float64),
+            "order": order,
+        }
+        version = str(int(time.time() * 1000))
+        version_dir = os.path.join(self.root, det_code, version)
+        os.makedirs(version_dir, exist_ok=True)
+        for column, values in columns.items():
+            with open(os.path.join(version_dir, f"{column}.npy"), "wb") as f:
+                np.save(f, values)
+        with self._lock:
+            self.meta[det_code] = {"fetched": time.time(), "version": version, "count": len(names),
+                                   "groups": sorted(groups), "group_ranges": group_ranges}
+            save_json_cache(self.meta_path, self.ttl, self.meta)
+            self._tables.pop(det_code, None)
+        # Earlier versions may still be mapped on some platforms; whatever cannot be removed now goes next time
+        for old in os.listdir(os.path.join(self.root, det_code)):
+            if old != version:
+                shutil.rmtree(os.path.join(self.root, det_code, old), ignore_errors=True)
+        return len(names)
+
+def query_nds_channels(det_code, host=NDS_HOST):
+    return [(chan.name, chan.sample_rate.value if chan.sample_rate is not None else np.nan)
+            for chan in ChannelList.query_nds2(f'{det_code}:*', host=host)]
+
+NDS_CATALOG = ChannelCatalog()
+
+def merge_intervals(intervals):
+    # Sorted, non-overlapping [start, end] list; touching intervals are joined
+    merged = []
+    for start, end in sorted(intervals):
+        if end <= start:
+            continue
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+def clip_intervals(intervals, start, end):
+    # Parts of a merged interval list inside [start, end); bisect skips everything before the window
+    i = max(0, bisect.bisect_right(intervals, [start, float("inf")]) - 1)
+    clipped = []
+    for lo, hi in intervals[i:]:
+        if lo >= end:
+            break
+        if hi > start:
+            clipped.append([max(lo, start), min(hi, end)])
+    return clipped
+
+def subtract_intervals(start, end, covered):
+    # Gaps of [start, end) not covered by a merged interval list
+    gaps = []
+    cursor = start
+    for lo, hi in clip_intervals(covered, start, end):
+        if lo > cursor:
+            gaps.append([cursor, lo])
+        cursor = max(cursor, hi)
+    if cursor < end:
+        gaps.append([cursor, end])
+    return gaps
+
+class AvailabilityStore:
+    # Per-channel NDS availability kept in NDS_AVAILABILITY_FILE as two merged interval lists: "queried"
+    # (GPS ranges already asked about) and "available" (data found there). A window is answered locally once
+    # it is fully queried; otherwise only its unseen gaps need to go to the server.
+    def __init__(self, path=NDS_AVAILABILITY_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self.channels = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r") as f:
+                    self.channels = json.load(f)
+            except Exception as e:
+                logging.warning(f"Ignoring unreadable availability store {path}: {e}")
+
+    def missing(self, channel, start, end):
+        with self._lock:
+            queried = self.channels.get(channel, {}).get("queried", [])
+            return subtract_intervals(start, end, queried)
+
+    def available(self, channel, start, end):
+        with self._lock:
+            return clip_intervals(self.channels.get(channel, {}).get("available", []), start, end)
+
+    def add(self, channel, start, end, segments):
+        with self._lock:
+            entry = self.channels.setdefault(channel, {"queried": [], "available": []})
+            entry["queried"] = merge_intervals(entry["queried"] + [[start, end]])
+            found = [[max(lo, start), min(hi, end)] for lo, hi in segments]
+            entry["available"] = merge_intervals(entry["available"] + found)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self.channels, f)
+            os.replace(tmp_path, self.path)
+
+def query_nds_availability(channel, start, end, host=NDS_HOST):
+    chanlist = ChannelList([Channel(channel)])
+    available = chanlist.query_nds2_availability([chanlist[0]], start, end, host=host)
+    return [[float(lo), float(hi)] for segments in available.values() for lo, hi in segments]
+
+NDS_AVAILABILITY = AvailabilityStore()
+
+def query_frame_types(det_code, server=DATAFIND_SERVER):
+    return sorted(datafind_call(find_types, det_code, host=server))
+
+def segments_to_table(segments):
+    # segmentlist -> int64 (n, 2) array of whole GPS seconds covering each segment
+    spans = np.asarray([tuple(seg) for seg in segments], dtype=np.float64).reshape(-1, 2)
+    return np.stack([np.floor(spans[:, 0]), np.ceil(spans[:, 1])], axis=1).astype(np.int64)
+
+def query_frame_times(det_code, frametype, server=DATAFIND_SERVER):
+    # Available (start, end) spans for a frame type, as listed by gw_data_find --show-times
+    return segments_to_table(datafind_call(find_times, det_code, frametype, host=server))
+
+class SegmentTableCache:
+    # Bounded LRU of frame-time tables keyed by (detector, frame type). Each table is an int64 (n, 2) array
+    # saved as its own .npy under root; index.json keeps the TTL and the entries from least to most
+    # recently used, so the order survives restarts and the oldest table is the one evicted.
+    def __init__(self, root=SEGMENT_CACHE_DIR, default_ttl=SEGMENT_CACHE_TTL, max_entries=SEGMENT_CACHE_MAX_ENTRIES):
+        self.root = root
+        self.index_path = os.path.join(root, "index.json")
+        self.max_entries = max_entries
+        self.ttl, entries = load_json_cache(self.index_path, default_ttl)
+        self.entries = OrderedDict(entries)
+        self._tables = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(det_code, frametype):
+        return f"{det_code}|{frametype}"
+
+    def get(self, det_code, frametype):
+        # The cached table, or None when it is missing or past the TTL
+        key = self._key(det_code, frametype)
+        with self._lock:
+            entry = self.entries.get(key)
+            if not cache_entry_fresh(entry, self.ttl):
+                return None
+            self.entries.move_to_end(key)
+            table = self._tables.get(key)
+            if table is None:
+                try:
+                    table = np.load(os.path.join(self.root, entry["file"]))
+                except (OSError, ValueError) as e:
+                    logging.warning(f"Dropping unreadable segment table {entry['file']}: {e}")
+                    self.entries.pop(key)
+                    return None
+                self._tables[key] = table
+            return table
+
+    def put(self, det_code, frametype, table):
+        key = self._key(det_code, frametype)
+        filename = re.sub(r"[^\w.-]", "_", key) + ".npy"
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = os.path.join(self.root, filename + ".tmp")
+        with open(tmp_path, "wb") as f:
+            np.save(f, table)
+        os.replace(tmp_path, os.path.join(self.root, filename))
+        with self._lock:
+            self.entries[key] = {"fetched": time.time(), "file": filename, "count": len(table)}
+            self.entries.move_to_end(key)
+            self._tables[key] = table
+            while len(self.entries) > self.max_entries:
+                self._drop(next(iter(self.entries)))
+            save_json_cache(self.index_path, self.ttl, self.entries)
+
+    def invalidate(self, det_code=None):
+        # Forget every table, or just one detector's
+        with self._lock:
+            for key in [k for k in self.entries if det_code is None or k.startswith(f"{det_code}|")]:
+                self._drop(key)
+            if os.path.isdir(self.root):
+                save_json_cache(self.index_path, self.ttl, self.entries)
+
+    def _drop(self, key):
+        entry = self.entries.pop(key)
+        self._tables.pop(key, None)
+        try:
+            os.remove(os.path.join(self.root, entry["file"]))
+        except OSError:
+            pass
+
+OSDF_SEGMENTS = SegmentTableCache()
+
+def frame_file_span(url):
+    # GPS [start, end) from a frame file name such as H-H1_GWOSC_4KHZ_R1-1238163456-4096.gwf
+    match = re.search(r"-(\d+)-(\d+)\.[^./]+$", urlparse(url).path)
+    if not match:
+        return None
+    start, duration = int(match.group(1)), int(match.group(2))
+    return start, start + duration
+
+class URLCache:
+    # find_urls / get_urls results per (site, frametype, urltype, host). Each entry holds the merged GPS
+    # intervals already asked about and every file seen, sorted by the span in its file name. A request inside
+    # the queried intervals is answered locally; only its uncovered gaps go to the server.
+    def __init__(self, path=URL_CACHE_FILE, default_ttl=URL_CACHE_TTL):
+        self.path = path
+        self.ttl, self.entries = load_json_cache(path, default_ttl)
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def resolve(self, key, start, end, query):
+        # query(gap_start, gap_end) -> URLs. Returns the URLs of every file overlapping [start, end) in GPS
+        # order. Lookups for the same key are serialised so overlapping segments never query the same gap twice.
+        key = "|".join(str(part) for part in key)
+        with self._key_lock(key):
+            with self._lock:
+                entry = self.entries.get(key)
+                if not cache_entry_fresh(entry, self.ttl):
+                    entry = self.entries[key] = {"fetched": time.time(), "queried": [], "files": [], "longest": 0}
+                gaps = subtract_intervals(start, end, entry["queried"])
+            for gap_start, gap_end in gaps:
+                urls = query(gap_start, gap_end)
+                with self._lock:
+                    known = {f[2] for f in entry["files"]}
+                    for url in urls:
+                        if url in known:
+                            continue
+                        file_start, file_end = frame_file_span(url) or (gap_start, gap_end)
+                        bisect.insort(entry["files"], [file_start, file_end, url])
+                        entry["longest"] = max(entry["longest"], file_end - file_start)
+                    entry["queried"] = merge_intervals(entry["queried"] + [[gap_start, gap_end]])
+            with self._lock:
+                if gaps:
+                    save_json_cache(self.path, self.ttl, self.entries)
+                files = entry["files"]
+                # No file starts more than the longest file duration before the window
+                lo = bisect.bisect_left(files, [start - entry["longest"]])
+                hi = bisect.bisect_left(files, [end])
+                return [url for file_start, file_end, url in files[lo:hi] if file_end > start]
+
+URL_CACHE = URLCache()
+
+def bulk_resolve(key, segments, query, log, max_gap=BULK_RESOLVE_MAX_GAP):
+    # Resolve a whole segment list with one lookup per hull of nearby segments (split where they are more than
+    # max_gap apart). The files land in URL_CACHE, so the per-segment lookups that follow are local bisections
+    # over the spans parsed from the file names.
+    hulls, _ = plan_segments(segments, max_gap)
+    for start, end, rows in hulls:
+        try:
+            urls = URL_CACHE.resolve(key, start, end, query)
+            log(f"Resolved {len(urls)} files for {len(rows)} segments in {start}-{end} with one lookup", "info")
+        except Exception as e:
+            # The per-segment lookups will retry whatever is still uncovered
+            log(f"Bulk URL lookup for {start}-{end} failed: {e}", "warning")
+
+def rate_limited(host, should_continue, fn, *args, **kwargs):
+    # Blocking call paced by RATE_LIMITER; used for server round-trips made from executor threads
+    if not RATE_LIMITER.acquire(host, should_continue):
+        raise RuntimeError("stopped before the request was sent")
+    try:
+        result = fn(*args, **kwargs)
+    except Exception:
+        RATE_LIMITER.failure(host)
+        raise
+    RATE_LIMITER.success(host)
+    return result
+
+def file_checksum(path, chunk_size=OSDF_CHUNK_SIZE):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def frame_files(seg_path):
+    # [(file name, gps_start, gps_end)] of the frame files in one segment directory, in GPS order, with spans
+    # from their names: NDS rows are named <channel>_<start>_<end>, OSDF frames <channel>_<start>_<duration>
+    files = []
+    for filename in os.listdir(seg_path):
+        match = re.search(r"_(\d+)_(\d+)\.(gwf|h5)$", filename)
+        if not match:
+            continue
+        a, b = int(match.group(1)), int(match.group(2))
+        files.append((filename, a, b) if b > a else (filename, a, a + b))
+    return sorted(files, key=lambda f: (f[1], f[0]))
+
+class Inventory:
+    # SQLite index of every frame file under one output directory: channel, frame type, GPS span, path, size,
+    # checksum and source. Fetch paths record each file in a transaction as soon as it is committed, and
+    # skip checks, channel listings and segment listings query the index instead of the filesystem. Paths
+    # are stored relative to the root as <channel dir>/<segment>/<file>. refresh() picks up directories added
+    # outside GWeasy (a new index starts with a full one); listings call it first. Lookups only touch the
+    # disk for what they return: a hit whose file (or directory) was deleted outside GWeasy is dropped from
+    # the index and treated as a miss.
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    @classmethod
+    def open(cls, root):
+        root = os.path.abspath(root)
+        with cls._instances_lock:
+            if root not in cls._instances:
+                cls._instances[root] = cls(root)
+            return cls._instances[root]
+
+    @classmethod
+    def find(cls, root):
+        # The index of root if it already has one, else None; for directories that may not be output directories
+        root = os.path.abspath(root)
+        if root in cls._instances or os.path.exists(os.path.join(root, INVENTORY_FILE)):
+            return cls.open(root)
+        return None
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        db_path = os.path.join(root, INVENTORY_FILE)
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(db_path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        with self.db:
+            self.db.execute("""CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                channel TEXT NOT NULL,
+                channel_dir TEXT NOT NULL,
+                segment TEXT NOT NULL,
+                frametype TEXT,
+                gps_start INTEGER NOT NULL,
+                gps_end INTEGER NOT NULL,
+                size INTEGER,
+                checksum TEXT,
+                source TEXT,
+                added REAL)""")
+            self.db.execute("CREATE INDEX IF NOT EXISTS files_by_segment ON files (channel_dir, segment)")
+            self.db.execute("CREATE INDEX IF NOT EXISTS files_by_span ON files (channel, gps_start, gps_end)")
+            self.db.execute("CREATE TABLE IF NOT EXISTS dirs (path TEXT PRIMARY KEY, mtime_ns INTEGER)")
+        self.refresh()
+
+    def _relpath(self, path):
+        return os.path.relpath(os.path.abspath(path), self.root).replace("\\", "/")
+
+    def path(self, relpath):
+        return os.path.join(self.root, *relpath.split("/"))
+
+    def _forget(self, where, params):
+        with self._lock, self.db:
+            self.db.execute(f"DELETE FROM files WHERE {where}", params)
+
+    def _existing(self, relpaths):
+        # The relpaths still on disk; the rest are dropped from the index
+        present, missing = [], []
+        for relpath in relpaths:
+            (present if os.path.exists(self.path(relpath)) else missing).append(relpath)
+        for relpath in missing:
+            self._forget("path = ?", (relpath,))
+        return present
+
+    def has(self, path):
+        return self.span(path) is not None
+
+    def channel_of(self, path):
+        with self._lock:
+            row = self.db.execute("SELECT channel FROM files WHERE path = ?", (self._relpath(path),)).fetchone()
+        return row[0] if row else None
+
+    def span(self, path):
+        # (gps_start, gps_end) of an indexed file that is still on disk, or None
+        relpath = self._relpath(path)
+        with self._lock:
+            row = self.db.execute("SELECT gps_start, gps_end FROM files WHERE path = ?", (relpath,)).fetchone()
+        if row is None or not self._existing([relpath]):
+            return None
+        return row
+
+    def has_segment(self, channel_dir, segment):
+        return bool(self.segment_files(channel_dir, segment))
+
+    def record(self, path, channel, start, end, frametype=None, source=None, checksum=None):
+        # Call once the file is in its final place; size and checksum are read from disk here
+        relpath = self._relpath(path)
+        parts = relpath.split("/")
+        size = os.path.getsize(path)
+        if checksum is None:
+            checksum = file_checksum(path)
+        with self._lock, self.db:
+            self.db.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                            (relpath, channel, parts[0], parts[1] if len(parts) > 2 else "", frametype,
+                             start, end, size, checksum, source, time.time()))
+
+    def remove(self, path):
+        with self._lock, self.db:
+            self.db.execute("DELETE FROM files WHERE path = ?", (self._relpath(path),))
+
+    def copy_of(self, channel_dir, name):
+        # (path, checksum) of a file called name in any segment directory of channel_dir that is still on disk,
+        # newest first, or None. OSDF frames keep their name in every segment they overlap.
+        with self._lock:
+            rows = self.db.execute("SELECT path, checksum FROM files WHERE channel_dir = ? AND "
+                                   "path = channel_dir || '/' || segment || '/' || ? ORDER BY added DESC",
+                                   (channel_dir, name)).fetchall()
+        for relpath, checksum in rows:
+            if self._existing([relpath]):
+                return self.path(relpath), checksum
+        return None
+
+    def channels(self):
+        with self._lock:
+            rows = self.db.execute("SELECT DISTINCT channel, channel_dir FROM files ORDER BY channel").fetchall()
+        present = set(self.channel_dirs())
+        return list(dict.fromkeys(channel for channel, channel_dir in rows if channel_dir in present))
+
+    def channel_dirs(self):
+        # Channel directories with indexed files; those removed from disk are dropped from the index
+        with self._lock:
+            rows = [row[0] for row in self.db.execute("SELECT DISTINCT channel_dir FROM files ORDER BY channel_dir")]
+        present = []
+        for channel_dir in rows:
+            if os.path.isdir(os.path.join(self.root, channel_dir)):
+                present.append(channel_dir)
+            else:
+                self._forget("channel_dir = ?", (channel_dir,))
+        return present
+
+    def segments(self, channel_dir):
+        # Segment directory names holding at least one file, in GPS order; removed directories are dropped
+        with self._lock:
+            rows = self.db.execute("SELECT segment, MIN(gps_start) FROM files WHERE channel_dir = ? AND segment != '' "
+                                   "GROUP BY segment ORDER BY MIN(gps_start)", (channel_dir,)).fetchall()
+        present = []
+        for segment, _ in rows:
+            if os.path.isdir(os.path.join(self.root, channel_dir, segment)):
+                present.append(segment)
+            else:
+                self._forget("channel_dir = ? AND segment = ?", (channel_dir, segment))
+        return present
+
+    def segment_files(self, channel_dir, segment):
+        # [(path, gps_start, gps_end)] in GPS order, for the files still on disk
+        with self._lock:
+            rows = self.db.execute("SELECT path, gps_start, gps_end FROM files WHERE channel_dir = ? AND segment = ? "
+                                   "ORDER BY gps_start, path", (channel_dir, segment)).fetchall()
+        present = set(self._existing(relpath for relpath, _, _ in rows))
+        return [(self.path(relpath), start, end) for relpath, start, end in rows if relpath in present]
+
+    def refresh(self):
+        # Index files that reached root by other means (copied in, fetched by an older build or another
+        # machine). Only directories whose mtime changed since the last refresh are listed, so an unchanged
+        # tree costs one scandir of root plus one of each changed channel directory. Checksums are left empty
+        # rather than reading every file. Returns the number of files newly indexed.
+        with self._lock:
+            known = dict(self.db.execute("SELECT path, mtime_ns FROM dirs"))
+        seen, rows = {}, []
+        for ch_entry in os.scandir(self.root):
+            if ch_entry.name.startswith(".") or not ch_entry.is_dir():
+                continue
+            channel_dir = ch_entry.name
+            mtime = ch_entry.stat().st_mtime_ns
+            if known.get(channel_dir) == mtime:
+                continue
+            seen[channel_dir] = mtime
+            channel = channel_dir.replace("_", ":", 1)
+            for seg_entry in os.scandir(ch_entry.path):
+                relpath = f"{channel_dir}/{seg_entry.name}"
+                if not seg_entry.is_dir():
+                    continue
+                mtime = seg_entry.stat().st_mtime_ns
+                if known.get(relpath) == mtime:
+                    continue
+                seen[relpath] = mtime
+                for filename, start, end in frame_files(seg_entry.path):
+                    file_path = os.path.join(seg_entry.path, filename)
+                    rows.append((f"{relpath}/{filename}", channel, channel_dir, seg_entry.name, None, start, end,
+                                 os.path.getsize(file_path), None, "scan", time.time()))
+        with self._lock, self.db:
+            before = self.db.total_changes
+            self.db.executemany("INSERT OR IGNORE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            added = self.db.total_changes - before
+            self.db.executemany("INSERT OR REPLACE INTO dirs VALUES (?, ?)", seen.items())
+        return added
+
+def link_file(src, dest):
+    # Place another copy of a frame already on disk; returns how: "hardlink", "symlink" or "copy"
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    if os.path.lexists(dest):
+        os.remove(dest)
+    try:
+        os.link(src, dest)
+        return "hardlink"
+    except OSError:
+        pass
+    try:
+        os.symlink(os.path.relpath(src, os.path.dirname(dest)), dest)
+        return "symlink"
+    except OSError:
+        shutil.copy2(src, dest)
+        return "copy"
+
+def ffl_number(value):
+    # GPS times and durations as written to an FFL: integers stay integers, fractions keep their precision
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+class FrameList:
+    # Sorted, deduplicated fin.ffl for one channel directory. Entries are (start, duration, path) with
+    # start and duration taken from the written frame (or the GPS span in its file name) and are kept
+    # sorted with bisect, so adding one costs O(log n) to place. An entry that lands at the end is appended
+    # to the file straight away; anything else marks the list dirty and flush() rewrites the file
+    # atomically. Two files covering exactly the same span are listed once. Gaps between consecutive
+    # frames go to a <ffl>.gaps sidecar, since Omicron does not accept comments in the FFL itself.
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    @classmethod
+    def open(cls, path):
+        path = os.path.abspath(path)
+        with cls._instances_lock:
+            frames = cls._instances.get(path)
+            if frames is None or frames._stat != frames._disk_stat():
+                # First use, or the file was changed by something else since we last wrote it
+                frames = cls._instances[path] = cls(path)
+            return frames
+
+    def __init__(self, path):
+        self.path = path
+        self.gaps_path = path + ".gaps"
+        self._lock = threading.Lock()
+        self.entries = []
+        self.spans = {}
+        self.covered = None  # latest GPS time covered by any entry
+        self.dirty = False
+        if os.path.exists(path):
+            last = None
+            with open(path, "r") as f:
+                for line in f:
+                    parts = line.split()
+                    if len(parts) < 3:
+                        continue
+                    try:
+                        start, duration = float(parts[1]), float(parts[2])
+                    except ValueError:
+                        continue
+                    entry = (start, duration, parts[0])
+                    # Duplicates and out-of-order lines are cleaned up on the next flush
+                    if not self._insert(parts[0], start, duration) or (last is not None and entry < last):
+                        self.dirty = True
+                    last = entry
+        self._stat = self._disk_stat()
+
+    def _disk_stat(self):
+        try:
+            st = os.stat(self.path)
+            return st.st_size, st.st_mtime_ns
+        except OSError:
+            return None
+
+    def _insert(self, ffl_path, start, duration):
+        key = (start, duration)
+        if key in self.spans:
+            return False
+        self.spans[key] = ffl_path
+        bisect.insort(self.entries, (start, duration, ffl_path))
+        self.covered = start + duration if self.covered is None else max(self.covered, start + duration)
+        return True
+
+    @staticmethod
+    def ffl_path(file_path):
+        return "./" + os.path.relpath(file_path, os.getcwd()).replace("\\", "/")
+
+    @staticmethod
+    def line(entry):
+        start, duration, ffl_path = entry
+        return f"{ffl_path} {ffl_number(start)} {ffl_number(duration)} 0 0\n"
+
+    def add(self, file_path, start, duration):
+        # Returns False when a frame with the same span is already listed
+        start, duration = float(start), float(duration)
+        with self._lock:
+            covered = self.covered
+            if not self._insert(self.ffl_path(file_path), start, duration):
+                return False
+            entry = (start, duration, self.spans[(start, duration)])
+            if self.dirty or self.entries[-1] != entry:
+                self.dirty = True
+                return True
+            with open(self.path, "a") as f:
+                f.write(self.line(entry))
+            if covered is not None and start > covered:
+                with open(self.gaps_path, "a") as f:
+                    f.write(f"{ffl_number(covered)} {ffl_number(start)}\n")
+            self._stat = self._disk_stat()
+            return True
+
+    def replace(self, frames):
+        # frames: [(file_path, start, duration)]
+        with self._lock:
+            self.entries = []
+            self.spans = {}
+            self.covered = None
+            for file_path, start, duration in frames:
+                self._insert(self.ffl_path(file_path), float(start), float(duration))
+            self.dirty = True
+
+    def gaps(self):
+        gaps = []
+        covered = None
+        for start, duration, _ in self.entries:
+            if covered is not None and start > covered:
+                gaps.append((covered, start))
+            covered = start + duration if covered is None else max(covered, start + duration)
+        return gaps
+
+    def flush(self):
+        with self._lock:
+            if not self.dirty:
+                return
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as f:
+                f.writelines(self.line(entry) for entry in self.entries)
+            os.replace(tmp_path, self.path)
+            tmp_path = self.gaps_path + ".tmp"
+            with open(tmp_path, "w") as f:
+                f.writelines(f"{ffl_number(a)} {ffl_number(b)}\n" for a, b in self.gaps())
+            os.replace(tmp_path, self.gaps_path)
+            self.dirty = False
+            self._stat = self._disk_stat()
+
+class ChannelExport:
+    # Raw samples of one channel as .npy files, one per exported row, in <channel dir>/export, plus an
+    # index.json of {start, end, rate, file} kept sorted by GPS span. Files are opened with
+    # mmap_mode='r', so slice() hands back views into the page cache without decoding any frame;
+    # only read() across several files copies. Rows are written to a tmp file and os.replace'd, then
+    # the index is rewritten the same way, so readers never see a half-written export. Rows are keyed by
+    # (start, end) and may overlap; slice() takes each sample from the first row that covers it.
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    @classmethod
+    def open(cls, ch_dir):
+        path = os.path.join(os.path.abspath(ch_dir), EXPORT_DIR)
+        with cls._instances_lock:
+            if path not in cls._instances:
+                cls._instances[path] = cls(path)
+            return cls._instances[path]
+
+    def __init__(self, path):
+        self.path = path
+        self.index_path = os.path.join(path, "index.json")
+        self._lock = threading.Lock()
+        self._maps = {}
+        self.rows = []
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r") as f:
+                self.rows = sorted(json.load(f).get("rows", []), key=lambda r: (r["start"], r["end"]))
+        self.spans = [(r["start"], r["end"]) for r in self.rows]
+        self.longest = max((end - start for start, end in self.spans), default=0)
+
+    def has(self, start, end):
+        with self._lock:
+            i = bisect.bisect_left(self.spans, (start, end))
+            return i < len(self.spans) and self.spans[i] == (start, end)
+
+    def add(self, data):
+        start, end = (float(t) for t in data.span)
+        filename = f"{ffl_number(start)}_{ffl_number(end)}.npy"
+        os.makedirs(self.path, exist_ok=True)
+        tmp_path = os.path.join(self.path, filename + ".tmp")
+        with open(tmp_path, "wb") as f:
+            np.save(f, np.asarray(data.value))
+        os.replace(tmp_path, os.path.join(self.path, filename))
+        row = {"start": start, "end": end, "rate": float(data.sample_rate.value), "file": filename}
+        with self._lock:
+            self._maps.pop(filename, None)
+            i = bisect.bisect_left(self.spans, (start, end))
+            if i < len(self.spans) and self.spans[i] == (start, end):
+                self.rows[i] = row
+            else:
+                self.rows.insert(i, row)
+                self.spans.insert(i, (start, end))
+                self.longest = max(self.longest, end - start)
+            tmp_path = self.index_path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"rows": self.rows}, f, indent=1)
+            os.replace(tmp_path, self.index_path)
+
+    def _map(self, filename):
+        if filename not in self._maps:
+            self._maps[filename] = np.load(os.path.join(self.path, filename), mmap_mode="r")
+        return self._maps[filename]
+
+    def slice(self, gps_start, gps_end):
+        # [(GPS time of the first sample, memmap view)] covering [gps_start, gps_end) in GPS order, each stretch
+        # once: where rows overlap, a later row only contributes the samples after those already covered
+        pieces = []
+        covered = gps_start
+        with self._lock:
+            # No row starts more than the longest row duration before the window
+            i = bisect.bisect_left(self.spans, (gps_start - self.longest,))
+            for row in self.rows[i:]:
+                if row["start"] >= gps_end:
+                    break
+                if row["end"] <= covered:
+                    continue
+                rate = row["rate"]
+                first = max(0, int(round((covered - row["start"]) * rate)))
+                last = int(round((min(gps_end, row["end"]) - row["start"]) * rate))
+                if last > first:
+                    pieces.append((row["start"] + first / rate, self._map(row["file"])[first:last]))
+                    covered = row["start"] + last / rate
+        return pieces
+
+    def read(self, gps_start, gps_end):
+        # One array for the range; zero-copy when it falls inside a single exported row. Gaps between rows
+        # are not filled in, so use slice() when the sample times matter.
+        pieces = self.slice(gps_start, gps_end)
+        if not pieces:
+            return np.empty(0)
+        return pieces[0][1] if len(pieces) == 1 else np.concatenate([view for _, view in pieces])
+
+def register_export(channel, path):
+    # Record a channel's export directory under "exports" in the history file
+    history = {}
+    if os.path.exists(HISTORY_FILE):
+        try:
+            with open(HISTORY_FILE, "r") as f:
+                history = json.load(f)
+        except Exception as e:
+            logging.warning(f"Rewriting unreadable history file {HISTORY_FILE}: {e}")
+    history.setdefault("exports", {})[channel] = path
+    tmp_path = HISTORY_FILE + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(history, f, indent=2)
+    os.replace(tmp_path, HISTORY_FILE)
+
 ########################################################################################################################################
 ############################################################    GRAVFETCH    ###########################################################
 ########################################################################################################################################
 
 class GravfetchApp(GradientWidget):
     log_signal = pyqtSignal(str, str)  # message, level
+    frame_types_signal = pyqtSignal(str, list)  # detector code, frame types
+    time_segments_signal = pyqtSignal(str, str)  # detector code, frame type whose segment table was fetched
+    nds_catalog_signal = pyqtSignal(str)  # detector code whose channel catalog was refreshed
+    nds_availability_signal = pyqtSignal(str)  # channel whose availability was updated
 
     def __init__(self, parent, append_output_callback):
         super().__init__(parent)
@@ -302,6 +2009,7 @@ class GravfetchApp(GradientWidget):
         self.execution_running = False
         self.process = None
         self.loaded_channels = []
+        self.csv_channels = []  # Only the imported channel CSV; loaded_channels also collects OSDF/NDS history
         self.time_ranges = None
         self.selected_channel = None
         self.selected_segments = []
@@ -318,11 +2026,12 @@ class GravfetchApp(GradientWidget):
             ("KAGRA", "K"),
         ]
         self.frame_types = {}  # Cache: {detector_code: [frame_types]}
-        self.time_segments = {}  # Cache: {(detector_code, frame_type): [segments]}
         self.selected_detector = None
         self.selected_detector_code = None
         self.selected_osdf_frametype = None
         self.selected_osdf_segments = []
+        self.osdf_max_workers = OSDF_MAX_WORKERS
+        self.osdf_max_per_host = OSDF_MAX_PER_HOST
         self.nds_detectors = [
             ("LIGO-Hanford", "H1"),
             ("LIGO-Livingston", "L1"),
@@ -330,9 +2039,6 @@ class GravfetchApp(GradientWidget):
             ("KAGRA", "K1"),
             ("","G1")
         ]
-        self.nds_channels = {}  # Cache: {detector_code: [(channel_name, sample_rate)]}
-        self.nds_groups = {}    # Cache: {detector_code: [group_names]}
-        self.nds_segments = {}  # Cache: {channel_name: [segments]}
         self.selected_nds_detector = None
         self.selected_nds_detector_code = None
         self.selected_nds_group = None
@@ -340,17 +2046,36 @@ class GravfetchApp(GradientWidget):
         self.selected_nds_segments = []
         self.channel_combo_bulk_nds = None
         self.selected_bulk_nds_channel = None
+        self.nds_parallel = False
+        self.assoc_multi_channel = False
+        self.nds_bulk_all_channels = False
+        self.nds_max_connections = NDS_MAX_CONNECTIONS_PER_HOST
+        self.recent_detectors = []  # ["osdf:H1", "nds:L1", ...], most recently used first
+        self.metadata_pending = set()  # (kind, detector) metadata fetches in flight
+        self.output_codecs = {}  # channel -> OUTPUT_CODECS name, DEFAULT_OUTPUT_CODEC when absent
+        self.export_mmap = False
+        self.exports = {}  # channel -> ChannelExport directory
+        self.refetch_existing = False
+        self.refetch_checks = []  # the refetch check box on each fetch tab
         if os.path.exists(HISTORY_FILE):
             try:
                 with open(HISTORY_FILE, "r") as f:
                     history = json.load(f)
                     self.gwfout_path = history.get("gwfout_path", DEFAULT_GWFOUT)
+                    self.recent_detectors = history.get("recent_detectors", [])
+                    self.output_codecs = {ch: codec for ch, codec in history.get("output_codecs", {}).items()
+                                          if codec in OUTPUT_CODECS}
+                    self.exports = history.get("exports", {})
             except Exception as e:
                 self.append_output(f"Failed to read history file: {e}", "error")
 
+        self.frame_types_signal.connect(self.update_frame_types)
+        self.time_segments_signal.connect(self.update_time_segments)
+        self.nds_catalog_signal.connect(self.update_nds_groups)
+        self.nds_availability_signal.connect(self.show_nds_availability)
         self.setup_ui()
-        self.refresh_osdf_data() 
-        self.refresh_nds_data()
+        # Detector metadata is loaded on first use; only recently used detectors are prefetched, once the window is up
+        QTimer.singleShot(METADATA_PREFETCH_DELAY_MS, self.prefetch_metadata)
 
     def setup_ui(self):
         self.tabs = QTabWidget()
@@ -481,6 +2206,35 @@ class GravfetchApp(GradientWidget):
         custom_time_layout.addWidget(self.custom_end_edit)
         layout.addLayout(custom_time_layout)
 
+        parallel_layout = QHBoxLayout()
+        parallel_layout.addWidget(QLabel("Parallel Downloads:", font=FONT_LABEL, styleSheet=f"color: {COLOR_FG}; background-color: transparent;"))
+        self.osdf_workers_combo = QComboBox()
+        self.osdf_workers_combo.addItems(["1", "2", "4", "8", "16"])
+        self.osdf_workers_combo.setCurrentText(str(self.osdf_max_workers))
+        parallel_layout.addWidget(self.osdf_workers_combo)
+        parallel_layout.addWidget(QLabel("Per Host:", font=FONT_LABEL, styleSheet=f"color: {COLOR_FG}; background-color: transparent;"))
+        self.osdf_per_host_combo = QComboBox()
+        self.osdf_per_host_combo.addItems(["1", "2", "4", "8"])
+        self.osdf_per_host_combo.setCurrentText(str(self.osdf_max_per_host))
+        parallel_layout.addWidget(self.osdf_per_host_combo)
+        for combo in (self.osdf_workers_combo, self.osdf_per_host_combo):
+            combo.setStyleSheet(f"""
+                QComboBox {{
+                    border: 1px solid {COLOR_FG};
+                    border-radius: 5px;
+                    padding: 4px;
+                    background-color: #747576;
+                    color: {COLOR_FG};
+                }}
+                QComboBox::drop-down {{
+                    border: none;
+                }}
+            """)
+        self.osdf_workers_combo.currentTextChanged.connect(lambda text: setattr(self, 'osdf_max_workers', int(text)))
+        self.osdf_per_host_combo.currentTextChanged.connect(lambda text: setattr(self, 'osdf_max_per_host', int(text)))
+        layout.addLayout(parallel_layout)
+        self.create_refetch_check(layout)
+
         button_layout = QHBoxLayout()
         refresh_btn = QPushButton("Refresh Lists")
         refresh_btn.setFont(FONT_BUTTON)
@@ -500,7 +2254,7 @@ class GravfetchApp(GradientWidget):
                 background-color: #A9A9A9;
             }}
         """)
-        refresh_btn.clicked.connect(self.refresh_osdf_data)
+        refresh_btn.clicked.connect(lambda: self.refresh_osdf_data(force=True))
         button_layout.addWidget(refresh_btn)
 
         download_btn = QPushButton("Download Data")
@@ -621,6 +2375,19 @@ class GravfetchApp(GradientWidget):
 
         channel_layout = QVBoxLayout()
         channel_layout.addWidget(QLabel("Channels:", font=FONT_LABEL, styleSheet=f"color: {COLOR_FG}; background-color: transparent;"))
+        self.nds_search_edit = QLineEdit()
+        self.nds_search_edit.setPlaceholderText("Search: DARM, H1:LSC-, *DARM*IN1*")
+        self.nds_search_edit.setStyleSheet(f"""
+            QLineEdit {{
+                border: 1px solid {COLOR_FG};
+                border-radius: 5px;
+                padding: 4px;
+                background-color: #747576;
+                color: {COLOR_FG};
+            }}
+        """)
+        self.nds_search_edit.textChanged.connect(self.on_nds_search)
+        channel_layout.addWidget(self.nds_search_edit)
         self.nds_channel_list = QListWidget()
         self.nds_channel_list.setStyleSheet(f"""
             QListWidget {{
@@ -686,11 +2453,15 @@ class GravfetchApp(GradientWidget):
             }}
         """)
         custom_time_layout.addWidget(self.nds_custom_end_edit)
+        # The custom window also sets the range the channel availability is listed for
+        self.nds_custom_start_edit.editingFinished.connect(self.refresh_nds_availability)
+        self.nds_custom_end_edit.editingFinished.connect(self.refresh_nds_availability)
         layout.addLayout(custom_time_layout)
+        self.create_refetch_check(layout)
 
         button_layout = QHBoxLayout()
         buttons = [
-            ("Refresh Lists", self.refresh_nds_data),
+            ("Refresh Lists", lambda: self.refresh_nds_data(force=True)),
             ("Download Data", self.download_nds_data),
             ("Start/Stop Execution", self.toggle_public_execution),
             ("Select Output Dir", self.select_output_dir)
@@ -734,6 +2505,7 @@ class GravfetchApp(GradientWidget):
             ("Import Channel CSV", self.select_channel_csv),
             ("Select Output Dir", self.select_output_dir),
             ("Select Time Segments", self.open_segments_dialog),
+            ("Benchmark Output Formats", self.select_benchmark_sample),
             ("Start/Stop Execution", self.toggle_bulk_nds_execution)
         ]
 
@@ -775,6 +2547,9 @@ class GravfetchApp(GradientWidget):
         """)
         self.channel_combo_bulk_nds.currentTextChanged.connect(self.on_channel_select_bulk_nds)
         layout.addWidget(self.channel_combo_bulk_nds)
+        self.codec_combo_bulk_nds = self.create_codec_selector(layout, lambda: self.selected_bulk_nds_channel)
+        self.export_check_bulk_nds = self.create_export_check(layout)
+        self.create_refetch_check(layout)
 
         layout.addWidget(QLabel("Frame Type:", font=FONT_LABEL, styleSheet=f"color: {COLOR_FG}; background-color: transparent;"))
         self.bulk_frametype_edit = QLineEdit()
@@ -810,6 +2585,39 @@ class GravfetchApp(GradientWidget):
         self.bulk_host_combo.currentTextChanged.connect(lambda text: setattr(self, 'selected_bulk_host', text))
         layout.addWidget(self.bulk_host_combo)
 
+        parallel_layout = QHBoxLayout()
+        self.nds_parallel_check = QCheckBox("Parallel segments (process pool)")
+        self.nds_parallel_check.setFont(FONT_LABEL)
+        self.nds_parallel_check.setStyleSheet(f"color: {COLOR_FG}; background-color: transparent;")
+        self.nds_parallel_check.setChecked(self.nds_parallel)
+        self.nds_parallel_check.toggled.connect(lambda checked: setattr(self, 'nds_parallel', checked))
+        parallel_layout.addWidget(self.nds_parallel_check)
+        self.nds_all_channels_check = QCheckBox("All CSV channels per connection")
+        self.nds_all_channels_check.setFont(FONT_LABEL)
+        self.nds_all_channels_check.setStyleSheet(f"color: {COLOR_FG}; background-color: transparent;")
+        self.nds_all_channels_check.setChecked(self.nds_bulk_all_channels)
+        self.nds_all_channels_check.toggled.connect(lambda checked: setattr(self, 'nds_bulk_all_channels', checked))
+        parallel_layout.addWidget(self.nds_all_channels_check)
+        parallel_layout.addWidget(QLabel("Connections per server:", font=FONT_LABEL, styleSheet=f"color: {COLOR_FG}; background-color: transparent;"))
+        self.nds_connections_combo = QComboBox()
+        self.nds_connections_combo.addItems([str(n) for n in range(1, NDS_MAX_PROCESSES + 1)])
+        self.nds_connections_combo.setCurrentText(str(self.nds_max_connections))
+        self.nds_connections_combo.setStyleSheet(f"""
+            QComboBox {{
+                border: 1px solid {COLOR_FG};
+                border-radius: 5px;
+                padding: 4px;
+                background-color: #747576;
+                color: {COLOR_FG};
+            }}
+            QComboBox::drop-down {{
+                border: none;
+            }}
+        """)
+        self.nds_connections_combo.currentTextChanged.connect(lambda text: setattr(self, 'nds_max_connections', int(text)))
+        parallel_layout.addWidget(self.nds_connections_combo)
+        layout.addLayout(parallel_layout)
+
         layout.addStretch()
         self.bulk_nds_tab.setLayout(layout)
 
@@ -825,6 +2633,7 @@ class GravfetchApp(GradientWidget):
             ("Import Channel CSV", self.select_channel_csv),
             ("Select Output Dir", self.select_output_dir),
             ("Select Time Segments", self.open_segments_dialog),
+            ("Benchmark Output Formats", self.select_benchmark_sample),
             ("Start/Stop Execution", self.toggle_assoc_execution)
         ]
 
@@ -867,6 +2676,16 @@ class GravfetchApp(GradientWidget):
         self.channel_combo_assoc.currentTextChanged.connect(self.on_channel_select_assoc)
         layout.addWidget(self.channel_combo_assoc)
 
+        self.assoc_multi_check = QCheckBox("All CSV channels of this detector in one frame read")
+        self.assoc_multi_check.setFont(FONT_LABEL)
+        self.assoc_multi_check.setStyleSheet(f"color: {COLOR_FG}; background-color: transparent;")
+        self.assoc_multi_check.setChecked(self.assoc_multi_channel)
+        self.assoc_multi_check.toggled.connect(lambda checked: setattr(self, 'assoc_multi_channel', checked))
+        layout.addWidget(self.assoc_multi_check)
+        self.codec_combo_assoc = self.create_codec_selector(layout, lambda: self.selected_channel)
+        self.export_check_assoc = self.create_export_check(layout)
+        self.create_refetch_check(layout)
+
         layout.addWidget(QLabel("Frame Type:", font=FONT_LABEL, styleSheet=f"color: {COLOR_FG}; background-color: transparent;"))
         self.frametype_edit = QLineEdit()
         self.frametype_edit.setStyleSheet(f"""
@@ -910,156 +2729,228 @@ class GravfetchApp(GradientWidget):
         layout.addStretch()
         self.assoc_tab.setLayout(layout)
 
-    def refresh_osdf_data(self):
+    def refresh_osdf_data(self, force=False):
         self.status_label_osdf.setText("Refreshing OSDF data...")
-        self.log_signal.emit("Refreshing OSDF data...", "info")
+        if force:
+            OSDF_SEGMENTS.invalidate()
+        self.ensure_metadata([("osdf", det_code) for _, det_code in self.detectors], force)
+
+    def ensure_metadata(self, keys, force=False):
+        # Show what is on disk for each (kind, detector) straight away; anything never fetched, past its TTL or
+        # (when forced) everything is fetched in the background. OSDF frame types are queried concurrently,
+        # NDS listings one detector at a time in the order given.
+        stale = []
+        for kind, det_code in keys:
+            fresh = self.load_frame_types(det_code) if kind == "osdf" else self.load_nds_channels(det_code)
+            if (force or not fresh) and (kind, det_code) not in self.metadata_pending:
+                self.metadata_pending.add((kind, det_code))
+                stale.append((kind, det_code))
+        if stale:
+            self.log_signal.emit(f"Fetching metadata for {', '.join(f'{kind}:{det}' for kind, det in stale)}...", "info")
+            FETCH_CORE.submit(self.fetch_metadata(stale))
+        return stale
+
+    async def fetch_metadata(self, keys):
+        jobs = []
+        osdf = [det_code for kind, det_code in keys if kind == "osdf"]
+        nds = [det_code for kind, det_code in keys if kind == "nds"]
+        if osdf:
+            jobs.append(self.revalidate_frame_types(osdf))
+        if nds:
+            jobs.append(self.sync_nds_catalog(nds))
         try:
-            for _, det_code in self.detectors:
-                try:
-                    # Use gw_data_find to list available frame types for the detector
-                    cmd = ["gw_data_find", "-r", "datafind.gwosc.org", "-o", det_code, "--show-types"]
-                    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-                    frame_types = []
-                    for line in result.stdout.strip().split("\n"):
-                        line = line.strip()
-                        if line and not line.startswith("#"):
-                            frame_types.append(line)
-                    self.frame_types[det_code] = frame_types if frame_types else ["No frame types available"]
-                    self.log_signal.emit(f"Fetched {len(frame_types)} frame types for {det_code}", "info")
-                except subprocess.CalledProcessError as e:
-                    self.log_signal.emit(f"Error fetching frame types for {det_code}: {e}", "error")
-                    self.frame_types[det_code] = ["No frame types available"]
-                except Exception as e:
-                    self.log_signal.emit(f"Unexpected error fetching frame types for {det_code}: {e}", "error")
-                    self.frame_types[det_code] = ["No frame types available"]
-
-            # Update frame type list if a detector is selected
-            if self.selected_detector_code and self.selected_detector_code in self.frame_types:
-                self.osdf_frametype_list.clear()
-                self.osdf_frametype_list.addItems(self.frame_types[self.selected_detector_code])
-                self.log_signal.emit(f"Updated frame types for {self.selected_detector_code}", "info")
+            await asyncio.gather(*jobs)
+        finally:
+            for key in keys:
+                self.metadata_pending.discard(key)
+
+    def load_frame_types(self, det_code):
+        # Cached frame types for one detector; returns whether they are still fresh
+        ttl, cache = load_json_cache(FRAME_TYPES_CACHE_FILE, FRAME_TYPES_TTL)
+        entry = cache.get(det_code)
+        if entry is not None:
+            self.update_frame_types(det_code, entry.get("types", []))
+        return cache_entry_fresh(entry, ttl)
+
+    def load_nds_channels(self, det_code):
+        if NDS_CATALOG.load(det_code) is not None:
+            self.update_nds_groups(det_code)
+        return NDS_CATALOG.fresh(det_code)
+
+    def note_detector_use(self, kind, det_code):
+        key = f"{kind}:{det_code}"
+        if self.recent_detectors[:1] == [key]:
+            return
+        self.recent_detectors = [key] + [k for k in self.recent_detectors if k != key]
+        self.save_history(announce=False)
+
+    def prefetch_metadata(self):
+        # Revalidate stale metadata for detectors used in earlier sessions, most recent first
+        known = {f"osdf:{det}" for _, det in self.detectors} | {f"nds:{det}" for _, det in self.nds_detectors}
+        keys = [tuple(key.split(":", 1)) for key in self.recent_detectors if key in known]
+        if keys:
+            self.ensure_metadata(keys)
+
+    async def revalidate_frame_types(self, det_codes):
+        async def revalidate(det_code):
+            try:
+                frame_types = await FETCH_CORE.call(query_frame_types, det_code)
+                self.log_signal.emit(f"Fetched {len(frame_types)} frame types for {det_code}", "info")
+                return det_code, frame_types
+            except Exception as e:
+                self.log_signal.emit(f"Error fetching frame types for {det_code}: {e}", "error")
+            return det_code, None
 
-            self.status_label_osdf.setText("OSDF data refreshed")
+        try:
+            results = await asyncio.gather(*(revalidate(det_code) for det_code in det_codes))
+            ttl, cache = load_json_cache(FRAME_TYPES_CACHE_FILE, FRAME_TYPES_TTL)
+            for det_code, frame_types in results:
+                if frame_types is None:
+                    # Keep whatever was cached (or the placeholder) when the server could not be reached
+                    if det_code not in cache:
+                        self.frame_types_signal.emit(det_code, [])
+                    continue
+                cache[det_code] = {"fetched": time.time(), "types": frame_types}
+                self.frame_types_signal.emit(det_code, frame_types)
+            save_json_cache(FRAME_TYPES_CACHE_FILE, ttl, cache)
             self.log_signal.emit("OSDF data refreshed successfully", "success")
         except Exception as e:
             self.log_signal.emit(f"Error refreshing OSDF data: {e}", "error")
-            self.status_label_osdf.setText("Idle")
 
-    def refresh_nds_data(self):
+    def update_frame_types(self, det_code, frame_types):
+        if self.frame_types.get(det_code) == (frame_types or ["No frame types available"]):
+            return
+        self.frame_types[det_code] = frame_types if frame_types else ["No frame types available"]
+        # Update frame type list if the detector is selected
+        if self.selected_detector_code == det_code:
+            self.osdf_frametype_list.clear()
+            self.osdf_frametype_list.addItems(self.frame_types[det_code])
+            self.log_signal.emit(f"Updated frame types for {det_code}", "info")
+        self.status_label_osdf.setText("OSDF data refreshed")
+
+    def refresh_nds_data(self, force=False):
         self.status_label_nds.setText("Refreshing NDS data...")
-        self.log_signal.emit("Refreshing NDS data...", "info")
-        try:
-            for _, det_code in self.nds_detectors:
-                try:
-                    chanlist = ChannelList.query_nds2(f'{det_code}:*', host='nds.gwosc.org')
-                    groups = {}
-                    channels = []
-                    for chan in chanlist:
-                        match = re.match(r'^(H1|L1|V1|K1):([A-Z]+)-?.*', chan.name)
-                        if match:
-                            group = match.group(2)
-                            channels.append((chan.name, str(chan.sample_rate)))
-                            if group not in groups:
-                                groups[group] = []
-                            groups[group].append((chan.name, str(chan.sample_rate)))
-                    self.nds_channels[det_code] = channels
-                    self.nds_groups[det_code] = sorted(groups.keys())
-                except Exception as e:
-                    self.log_signal.emit(f"Error fetching channels for {det_code}: {e}", "error")
-                    self.nds_channels[det_code] = []
-                    self.nds_groups[det_code] = ["No groups available"]
+        self.ensure_metadata([("nds", det_code) for _, det_code in self.nds_detectors], force)
 
-            if self.selected_nds_detector_code and self.selected_nds_detector_code in self.nds_groups:
-                self.nds_group_list.clear()
-                self.nds_group_list.addItems(self.nds_groups[self.selected_nds_detector_code])
+    async def sync_nds_catalog(self, det_codes):
+        # One detector at a time: every listing goes to the same NDS server
+        for det_code in det_codes:
+            try:
+                channels = await FETCH_CORE.call(query_nds_channels, det_code)
+                count = await FETCH_CORE.call(NDS_CATALOG.store, det_code, channels)
+                del channels
+                self.log_signal.emit(f"Synced {count} channels for {det_code}", "info")
+                self.nds_catalog_signal.emit(det_code)
+            except Exception as e:
+                self.log_signal.emit(f"Error fetching channels for {det_code}: {e}", "error")
+        self.log_signal.emit("NDS data refreshed successfully", "success")
 
-            self.status_label_nds.setText("NDS data refreshed")
-            self.log_signal.emit("NDS data refreshed successfully", "success")
-        except Exception as e:
-            self.log_signal.emit(f"Error refreshing NDS data: {e}", "error")
-            self.status_label_nds.setText("Idle")
+    def update_nds_groups(self, det_code):
+        if self.selected_nds_detector_code == det_code:
+            self.nds_group_list.clear()
+            self.nds_group_list.addItems(NDS_CATALOG.groups(det_code) or ["No groups available"])
+        self.status_label_nds.setText("NDS data refreshed")
 
     def on_detector_select(self, current, previous):
         if current:
             self.selected_detector = current.text()
             self.selected_detector_code = next(code for name, code in self.detectors if name == self.selected_detector)
             self.osdf_frametype_list.clear()
-            if self.selected_detector_code in self.frame_types:
-                self.osdf_frametype_list.addItems(self.frame_types[self.selected_detector_code])
-            else:
-                self.osdf_frametype_list.addItems(["No frame types available"])
             self.osdf_segments_list.clear()
             self.selected_osdf_frametype = None
             self.selected_osdf_segments = []
+            if self.selected_detector_code in self.frame_types:
+                self.osdf_frametype_list.addItems(self.frame_types[self.selected_detector_code])
+            # Fills the list from the on-disk cache if it was not shown above
+            self.ensure_metadata([("osdf", self.selected_detector_code)])
+            if self.selected_detector_code not in self.frame_types:
+                self.status_label_osdf.setText(f"Loading frame types for {self.selected_detector_code}...")
+            self.note_detector_use("osdf", self.selected_detector_code)
 
     def on_nds_detector_select(self, current, previous):
         if current:
             self.selected_nds_detector = current.text()
             self.selected_nds_detector_code = next(code for name, code in self.nds_detectors if name == self.selected_nds_detector)
-            self.nds_group_list.clear()
-            if self.selected_nds_detector_code in self.nds_groups:
-                self.nds_group_list.addItems(self.nds_groups[self.selected_nds_detector_code])
-            else:
-                self.nds_group_list.addItems(["No groups available"])
             self.nds_channel_list.clear()
             self.nds_segments_list.clear()
             self.selected_nds_group = None
             self.selected_nds_channel = None
             self.selected_nds_segments = []
+            self.nds_group_list.clear()
+            # Fills the group list from the catalog, if this detector has one yet
+            self.ensure_metadata([("nds", self.selected_nds_detector_code)])
+            if NDS_CATALOG.load(self.selected_nds_detector_code) is None:
+                self.status_label_nds.setText(f"Loading channels for {self.selected_nds_detector_code}...")
+            self.note_detector_use("nds", self.selected_nds_detector_code)
 
     def on_nds_group_select(self, current, previous):
         if current:
             self.selected_nds_group = current.text()
-            self.nds_channel_list.clear()
-            if (self.selected_nds_detector_code and 
-                self.selected_nds_group and 
-                self.selected_nds_group != "No groups available"):
-                channels = [(name, rate) for name, rate in self.nds_channels.get(self.selected_nds_detector_code, []) 
-                           if re.match(rf'^{self.selected_nds_detector_code}:{self.selected_nds_group}-?.*', name)]
-                self.nds_channel_list.addItems([f"{name} ({rate})" for name, rate in channels])
-            else:
-                self.nds_channel_list.addItems(["No channels available"])
-            self.nds_segments_list.clear()
-            self.selected_nds_channel = None
-            self.selected_nds_segments = []
+            self.nds_search_edit.blockSignals(True)
+            self.nds_search_edit.clear()
+            self.nds_search_edit.blockSignals(False)
+            self.show_nds_channels(self.group_channels())
+
+    def group_channels(self):
+        if (self.selected_nds_detector_code and 
+            self.selected_nds_group and 
+            self.selected_nds_group != "No groups available"):
+            return NDS_CATALOG.group_channels(self.selected_nds_detector_code, self.selected_nds_group)
+        return []
+
+    def on_nds_search(self, text):
+        text = text.strip()
+        if not text:
+            self.show_nds_channels(self.group_channels())
+        elif self.selected_nds_detector_code:
+            channels = NDS_CATALOG.search(self.selected_nds_detector_code, text)
+            self.show_nds_channels(channels)
+            if len(channels) >= NDS_SEARCH_LIMIT:
+                self.status_label_nds.setText(f"Showing the first {NDS_SEARCH_LIMIT} matches")
+
+    def show_nds_channels(self, channels):
+        self.nds_channel_list.clear()
+        self.nds_channel_list.addItems([f"{name} ({rate:g} Hz)" for name, rate in channels] or ["No channels available"])
+        self.nds_segments_list.clear()
+        self.selected_nds_channel = None
+        self.selected_nds_segments = []
 
     def on_osdf_frametype_select(self, current, previous):
         if current:
             self.selected_osdf_frametype = current.text()
             self.osdf_segments_list.clear()
+            self.selected_osdf_segments = []
             if self.selected_detector_code and self.selected_osdf_frametype and self.selected_osdf_frametype != "No frame types available":
-                try:
-                    cmd = ["gw_data_find", "-r", "datafind.gwosc.org", "-o", self.selected_detector_code, "-t", self.selected_osdf_frametype, "--show-times"]
-                    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-                    segments = []
-                    display_segments = []
-                    for line in result.stdout.strip().split("\n"):
-                        line = line.strip()
-                        if line and not line.startswith("#"):
-                            try:
-                                parts = line.split()
-                                if len(parts) >= 4:
-                                    seg_id, start, end, duration = parts[:4]
-                                    start, end, duration = int(start), int(end), int(duration)
-                                    segments.append(f"{start}_{end}")
-                                    display_segments.append(f"{seg_id} {start}_{end} ({duration}s)")
-                                else:
-                                    self.append_output(f"Skipping invalid segment line: {line} (insufficient fields)", "warning")
-                            except ValueError as e:
-                                self.append_output(f"Skipping invalid segment line: {line} ({e})", "warning")
-                                continue
-                    self.time_segments[(self.selected_detector_code, self.selected_osdf_frametype)] = segments if segments else ["No segments available"]
-                    self.osdf_segments_list.addItems(display_segments if display_segments else ["No segments available"])
-                except subprocess.CalledProcessError as e:
-                    self.append_output(f"Error fetching time segments for {self.selected_detector_code}/{self.selected_osdf_frametype}: {e}", "error")
-                    self.time_segments[(self.selected_detector_code, self.selected_osdf_frametype)] = ["No segments available"]
-                    self.osdf_segments_list.addItems(["No segments available"])
-                except Exception as e:
-                    self.append_output(f"Unexpected error fetching time segments: {e}", "error")
-                    self.osdf_segments_list.addItems(["No segments available"])
+                table = OSDF_SEGMENTS.get(self.selected_detector_code, self.selected_osdf_frametype)
+                if table is not None:
+                    self.show_time_segments(table)
+                    return
+                self.osdf_segments_list.addItems(["Loading segments..."])
+                FETCH_CORE.submit(self.load_time_segments(self.selected_detector_code, self.selected_osdf_frametype))
             else:
                 self.osdf_segments_list.addItems(["No segments available"])
-            self.selected_osdf_segments = []
+
+    async def load_time_segments(self, det_code, frametype):
+        try:
+            table = await FETCH_CORE.call(query_frame_times, det_code, frametype)
+            if len(table):
+                # Failed or empty lookups are not cached and are retried on the next click
+                await FETCH_CORE.call(OSDF_SEGMENTS.put, det_code, frametype, table)
+        except Exception as e:
+            self.log_signal.emit(f"Error fetching time segments for {det_code}/{frametype}: {e}", "error")
+        self.time_segments_signal.emit(det_code, frametype)
+
+    def update_time_segments(self, det_code, frametype):
+        if (det_code, frametype) == (self.selected_detector_code, self.selected_osdf_frametype):
+            table = OSDF_SEGMENTS.get(det_code, frametype)
+            self.show_time_segments(table if table is not None else np.empty((0, 2), dtype=np.int64))
+
+    def show_time_segments(self, table):
+        self.osdf_segments_list.clear()
+        durations = (table[:, 1] - table[:, 0]).tolist()
+        display_segments = [f"{seg_id} {start}_{end} ({duration}s)"
+                            for seg_id, ((start, end), duration) in enumerate(zip(table.tolist(), durations))]
+        self.osdf_segments_list.addItems(display_segments if display_segments else ["No segments available"])
 
     def download_osdf_data(self):
         if not self.selected_detector_code or not self.selected_osdf_frametype or self.selected_osdf_frametype == "No frame types available":
@@ -1093,7 +2984,7 @@ class GravfetchApp(GradientWidget):
         self.execution_running = True
         self.status_label_osdf.setText("Downloading OSDF data...")
         self.append_output("Starting OSDF data download...", "info")
-        threading.Thread(target=self.run_osdf_download, args=(segments,), daemon=True).start()
+        FETCH_CORE.submit(self.run_osdf_download(segments))
 
     def download_nds_data(self):
         if not self.selected_nds_detector_code or not self.selected_nds_channel:
@@ -1127,122 +3018,143 @@ class GravfetchApp(GradientWidget):
         self.execution_running = True
         self.status_label_nds.setText("Downloading NDS data...")
         self.log_signal.emit("Starting NDS data download...", "info")
-        threading.Thread(target=self.run_gravfetch_public, args=(segments, False), daemon=True).start()
+        FETCH_CORE.submit(self.run_gravfetch_public(segments, False))
 
-    def run_osdf_download(self, segments):
+    async def run_osdf_download(self, segments):
         try:
             os.makedirs(self.gwfout_path, exist_ok=True)
             channel = f"{self.selected_detector_code}:{self.selected_osdf_frametype}"
+            detector_code = self.selected_detector_code
+            frametype = self.selected_osdf_frametype
             ch_dir = os.path.join(self.gwfout_path, channel.replace(":", "_"))
             os.makedirs(ch_dir, exist_ok=True)
-            fin_path = os.path.join(ch_dir, "fin.ffl")
-            timeout_duration = 2  # Seconds between downloads
-            url_fetch_delay = 1   # Seconds after fetching URLs
+            frames = FrameList.open(os.path.join(ch_dir, "fin.ffl"))
+            inventory = Inventory.open(self.gwfout_path)
+            await FETCH_CORE.call(inventory.refresh)
             host = "https://datafind.gw-openscience.org"
-
-            downloaded_count = 0
-            for seg in segments:
-                if not self.execution_running:
-                    self.log_signal.emit("OSDF download stopped by user.", "warning")
-                    break
+            should_continue = lambda: self.execution_running
+            limiter = HostLimiter(self.osdf_max_per_host)
+            transfers = asyncio.Semaphore(self.osdf_max_workers)
+            self.log_signal.emit(f"Using {self.osdf_max_workers} parallel downloads ({self.osdf_max_per_host} per host)", "info")
+
+            refetch = self.refetch_existing
+            frame_fetches = {}
+
+            async def fetch_frame(url, filepath, start, end):
+                # First copy of a frame in this run: one already downloaded for another segment of this channel
+                # (frames keep their name in every segment they overlap), or a fresh download straight into
+                # filepath. Returns (path, checksum) or None.
+                name = os.path.basename(filepath)
+                copy = None if refetch else await FETCH_CORE.call(inventory.copy_of, os.path.basename(ch_dir), name)
+                if copy is not None:
+                    return copy
+                async with transfers:
+                    async with limiter.slot(url):
+                        if not self.execution_running:
+                            return None
+                        if not await FETCH_CORE.call(self.download_osdf_file, url, filepath):
+                            return None
+                checksum = await FETCH_CORE.call(file_checksum, filepath)
+                await FETCH_CORE.call(inventory.record, filepath, channel, start, end, frametype, "osdf", checksum)
+                return filepath, checksum
+
+            async def transfer(url, filepath, timestamp, duration):
+                # Overlapping segments share one fetch_frame per URL; the others link to the copy it placed
+                start, end = int(timestamp), int(timestamp) + int(duration)
+                if url not in frame_fetches:
+                    frame_fetches[url] = asyncio.ensure_future(fetch_frame(url, filepath, start, end))
+                frame = await asyncio.shield(frame_fetches[url])
+                if frame is None:
+                    return False
+                src, checksum = frame
+                if os.path.abspath(src) != os.path.abspath(filepath):
+                    how = await FETCH_CORE.call(link_file, src, filepath)
+                    await FETCH_CORE.call(inventory.record, filepath, channel, start, end, frametype, "osdf", checksum)
+                    self.log_signal.emit(f"Linked {os.path.basename(filepath)} from {os.path.dirname(src)} ({how})", "info")
+                return True
+
+            url_key = (detector_code, frametype, "osdf", host)
+
+            def query_urls(gps_start, gps_end):
+                return rate_limited(url_host(host), should_continue, datafind_call, find_urls,
+                                    detector_code, frametype, gps_start, gps_end, urltype='osdf', host=host)
+
+            async def resolve_segment(seg):
+                # Look up one segment's URLs and queue its transfers; returns [(task, filepath, timestamp, duration)]
+                start, end = map(int, seg.split("_"))
+                segment_dir = os.path.join(ch_dir, f"{start}_{end}")
+                os.makedirs(segment_dir, exist_ok=True)
+                self.log_signal.emit(f"Finding URLs for {channel} {start}-{end}...", "info")
                 try:
-                    start, end = map(int, seg.split("_"))
-                    self.log_signal.emit(f"Finding URLs for {channel} {start}-{end}...", "info")
-                    segment_dir = os.path.join(ch_dir, f"{start}_{end}")
-                    os.makedirs(segment_dir, exist_ok=True)
+                    urls = await FETCH_CORE.call(URL_CACHE.resolve, url_key, start, end, query_urls)
+                except Exception as e:
+                    self.log_signal.emit(f"Error fetching URLs for {channel} {start}-{end}: {e}\n{traceback.format_exc()}", "error")
+                    return []
+                if not urls:
+                    self.log_signal.emit(f"No files found for {start} to {end}", "warning")
+                    return []
+                self.log_signal.emit(f"Found {len(urls)} URLs for {start}-{end}", "info")
+                self.log_signal.emit(f"URLs: {urls}", "info")
+                # Check segment coverage
+                url_times = sorted(span for span in map(frame_file_span, urls) if span is not None)
+                expected_start = start
+                for ts, te in url_times:
+                    if ts > expected_start:
+                        self.log_signal.emit(f"Gap in coverage: {expected_start} to {ts}", "warning")
+                    expected_start = max(expected_start, te)
+                if expected_start < end:
+                    self.log_signal.emit(f"Gap in coverage: {expected_start} to {end}", "warning")
+                if len(urls) > 1:
+                    self.log_signal.emit(f"Multiple URLs ({len(urls)}) for {start}-{end}, saving each to a unique file", "warning")
+                queued = []
+                for url in urls:
+                    # Extract timestamp and duration from URL
+                    url_parts = url.split("/")[-1].split("-")
+                    timestamp = url_parts[-2]
+                    duration = url_parts[-1].replace(".gwf", "")
+                    filename = f"{channel.replace(':','_')}_{timestamp}_{duration}.gwf"
+                    filepath = os.path.join(segment_dir, filename)
+                    if not refetch and inventory.has(filepath):
+                        frames.add(filepath, int(timestamp), int(duration))
+                        self.log_signal.emit(f"File {filename} already downloaded for {channel}. Skipping.", "info")
+                        continue
+                    queued.append((asyncio.ensure_future(transfer(url, filepath, timestamp, duration)), filepath, timestamp, duration))
+                return queued
+
+            # One bulk lookup covers the whole list, then every segment's lookup runs concurrently against the
+            # cache; fin.ffl entries are placed in GPS order by the FrameList
+            await FETCH_CORE.call(bulk_resolve, url_key, segments, query_urls, self.log_signal.emit)
+            lookups = [asyncio.ensure_future(resolve_segment(seg)) for seg in segments]
+            all_transfers = []
+            downloaded_count = 0
+            try:
+                for seg, lookup in zip(segments, lookups):
                     try:
-                        urls = find_urls(self.selected_detector_code, self.selected_osdf_frametype, start, end, urltype='osdf', host=host)
-                    except Exception as e:
-                        self.log_signal.emit(f"Error fetching URLs for {channel} {start}-{end}: {e}\n{traceback.format_exc()}", "error")
+                        queued = await lookup
+                    except ValueError as e:
+                        self.log_signal.emit(f"Invalid segment format {seg}: {e}", "error")
                         continue
-                    if not urls:
-                        self.log_signal.emit(f"No files found for {start} to {end}", "warning")
+                    except Exception as e:
+                        self.log_signal.emit(f"Error processing segment {seg} for {channel}: {e}\n{traceback.format_exc()}", "error")
                         continue
-                    self.log_signal.emit(f"Found {len(urls)} URLs for {start}-{end}", "info")
-                    self.log_signal.emit(f"URLs: {urls}", "info")
-                    # Check segment coverage
-                    url_times = []
-                    for url in urls:
-                        url_parts = url.split("/")[-1].split("-")
-                        timestamp = int(url_parts[-2])
-                        duration = int(url_parts[-1].replace(".gwf", ""))
-                        url_times.append((timestamp, timestamp + duration))
-                    url_times.sort()
-                    expected_start = start
-                    for ts, te in url_times:
-                        if ts > expected_start:
-                            self.log_signal.emit(f"Gap in coverage: {expected_start} to {ts}", "warning")
-                        expected_start = max(expected_start, te)
-                    if expected_start < end:
-                        self.log_signal.emit(f"Gap in coverage: {expected_start} to {end}", "warning")
-                    if len(urls) > 1:
-                        self.log_signal.emit(f"Multiple URLs ({len(urls)}) for {start}-{end}, saving each to a unique file", "warning")
-                    time.sleep(url_fetch_delay)  # 1-second delay after fetching URLs
-                    for url in urls:
-                        if not self.execution_running:
-                            self.log_signal.emit("OSDF download stopped by user.", "warning")
-                            break
-                        # Extract timestamp and duration from URL
-                        url_parts = url.split("/")[-1].split("-")
-                        timestamp = url_parts[-2]
-                        duration = url_parts[-1].replace(".gwf", "")
-                        filename = f"{channel.replace(':','_')}_{timestamp}_{duration}.gwf"
-                        filepath = os.path.join(segment_dir, filename)
-                        if os.path.exists(filepath):
-                            self.log_signal.emit(f"File {filename} already downloaded for {channel}. Skipping.", "info")
-                            continue
-                        self.log_signal.emit(f"Checking availability of {url}...", "info")
+                    all_transfers.extend(task for task, _, _, _ in queued)
+                    for task, filepath, timestamp, duration in queued:
                         try:
-                            head_response = rp.head(url, timeout=15)
-                            if head_response.status_code != 200:
-                                self.log_signal.emit(f"URL unavailable: {url} (Status: {head_response.status_code})", "warning")
-                                continue
-                            expected_size = int(head_response.headers.get('Content-Length', 0))
-                            self.log_signal.emit(f"URL {url} is available, expected size: {expected_size} bytes", "info")
-                        except RequestException as e:
-                            self.log_signal.emit(f"Failed to check {url}: {e}\n{traceback.format_exc()}", "error")
+                            ok = await task
+                        except Exception as e:
+                            self.log_signal.emit(f"Download worker failed for {filepath}: {e}\n{traceback.format_exc()}", "error")
                             continue
-                        self.log_signal.emit(f"Downloading: {url}", "info")
-                        max_retries = 5
-                        for attempt in range(max_retries):
-                            try:
-                                content = rp.get(url, timeout=120).content
-                                actual_size = len(content)
-                                if expected_size > 0 and actual_size != expected_size:
-                                    self.log_signal.emit(f"Size mismatch for {url}: expected {expected_size}, got {actual_size}", "error")
-                                    if attempt < max_retries - 1:
-                                        self.log_signal.emit(f"Retrying {url} (attempt {attempt + 2}/{max_retries})...", "info")
-                                        time.sleep(timeout_duration)
-                                        continue
-                                    break
-                                self.log_signal.emit(f"Downloaded {actual_size} bytes for {url}", "info")
-                                with open(filepath, "wb") as f:
-                                    f.write(content)
-                                saved_size = os.path.getsize(filepath)
-                                self.log_signal.emit(f"Saved: {filepath} ({saved_size} bytes)", "success")
-                                rel_path = os.path.relpath(filepath, os.getcwd()).replace("\\", "/")
-                                dt = int(duration)
-                                with open(fin_path, "a") as fin:
-                                    fin.write(f"./{rel_path} {timestamp} {dt} 0 0\n")
-                                downloaded_count += 1
-                                self.log_signal.emit(f"Waiting {timeout_duration}s before next download...", "info")
-                                time.sleep(timeout_duration)
-                                break  # Success, move to next URL
-                            except RequestException as e:
-                                self.log_signal.emit(f"Failed to download {url}: {e}\n{traceback.format_exc()}", "error")
-                                if attempt < max_retries - 1:
-                                    self.log_signal.emit(f"Retrying {url} (attempt {attempt + 2}/{max_retries})...", "info")
-                                    time.sleep(timeout_duration)
-                                else:
-                                    self.log_signal.emit(f"Max retries reached for {url}", "error")
-                                continue
-                except ValueError as e:
-                    self.log_signal.emit(f"Invalid segment format {seg}: {e}", "error")
-                    continue
-                except Exception as e:
-                    self.log_signal.emit(f"Error processing segment {seg} for {channel}: {e}\n{traceback.format_exc()}", "error")
-                    continue
-
+                        if not ok:
+                            continue
+                        frames.add(filepath, int(timestamp), int(duration))
+                        downloaded_count += 1
+            finally:
+                for task in lookups + all_transfers + list(frame_fetches.values()):
+                    task.cancel()
+                frames.flush()
+
+            if not self.execution_running:
+                self.log_signal.emit("OSDF download stopped by user.", "warning")
             if downloaded_count > 0:
                 self.log_signal.emit(f"Downloaded {downloaded_count} files successfully.", "success")
                 if channel not in self.loaded_channels:
@@ -1256,6 +3168,132 @@ class GravfetchApp(GradientWidget):
             self.execution_running = False
             self.status_label_osdf.setText("OSDF Download Failed")
 
+    def download_osdf_file(self, url, filepath):
+        max_retries = 5
+        endpoint = url_host(url)
+        should_continue = lambda: self.execution_running
+        if not self.execution_running:
+            return False
+        # Frames are streamed to a .part file next to the target and only renamed into place once complete,
+        # so a half-written .gwf never passes the os.path.exists skip check. A .part file left behind by a
+        # dropped connection (or an earlier run) is resumed with a Range request instead of being refetched.
+        # Availability and size come from the GET response itself, so each attempt is a single round trip.
+        part_path = filepath + ".part"
+        self.log_signal.emit(f"Downloading: {url}", "info")
+        for attempt in range(max_retries):
+            if not self.execution_running:
+                self.log_signal.emit(f"Download of {url} stopped by user, keeping partial file for resume.", "warning")
+                return False
+            if not RATE_LIMITER.acquire(endpoint, should_continue):
+                self.log_signal.emit(f"Download of {url} stopped by user, keeping partial file for resume.", "warning")
+                return False
+            try:
+                offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+                headers = {"Range": f"bytes={offset}-"} if offset else {}
+                with OSDF_SESSIONS.stream(url, timeout=120, headers=headers) as response:
+                    expected_size = self.response_total_size(response)
+                    if response.status_code == 416:
+                        if not (offset and expected_size == offset):
+                            # Server says the range is unsatisfiable: the partial file cannot be trusted
+                            self.discard_partial(part_path)
+                            raise RequestException(f"Range {offset}- not satisfiable for {url}")
+                        self.log_signal.emit(f"Partial file for {url} is already complete", "info")
+                    elif response.status_code in (403, 404, 410):
+                        RATE_LIMITER.success(endpoint)
+                        self.log_signal.emit(f"URL unavailable: {url} (Status: {response.status_code})", "warning")
+                        return False
+                    else:
+                        response.raise_for_status()
+                        self.log_signal.emit(f"URL {url} is available, expected size: {expected_size} bytes", "info")
+                        if offset and response.status_code == 206 and self.content_range_start(response) == offset:
+                            mode = "ab"
+                            self.log_signal.emit(f"Resuming {url} at byte {offset}/{expected_size}", "info")
+                        else:
+                            if offset:
+                                self.log_signal.emit(f"Server ignored range request for {url}, restarting transfer", "warning")
+                            mode = "wb"
+                            offset = 0
+                        actual_size = offset
+                        oversized = False
+                        with open(part_path, mode) as f:
+                            for chunk in response.iter_content(chunk_size=OSDF_CHUNK_SIZE):
+                                if not self.execution_running:
+                                    break
+                                if not chunk:
+                                    continue
+                                actual_size += len(chunk)
+                                if expected_size > 0 and actual_size > expected_size:
+                                    oversized = True
+                                    break
+                                f.write(chunk)
+                            f.flush()
+                            os.fsync(f.fileno())
+                        if not self.execution_running:
+                            self.log_signal.emit(f"Download of {url} stopped by user, keeping partial file for resume.", "warning")
+                            return False
+                        if oversized:
+                            self.log_signal.emit(f"Size mismatch for {url}: expected {expected_size}, got more than that", "error")
+                            self.discard_partial(part_path)
+                            RATE_LIMITER.failure(endpoint)
+                            if attempt < max_retries - 1:
+                                self.log_signal.emit(f"Retrying {url} (attempt {attempt + 2}/{max_retries})...", "info")
+                                RATE_LIMITER.backoff(attempt, should_continue)
+                                continue
+                            return False
+                        if expected_size > 0 and actual_size < expected_size:
+                            # Short read: keep what arrived and pick up from there on the next attempt
+                            self.log_signal.emit(f"Transfer of {url} ended early: {actual_size}/{expected_size} bytes", "warning")
+                            RATE_LIMITER.failure(endpoint)
+                            if attempt < max_retries - 1:
+                                self.log_signal.emit(f"Resuming {url} (attempt {attempt + 2}/{max_retries})...", "info")
+                                RATE_LIMITER.backoff(attempt, should_continue)
+                                continue
+                            return False
+                RATE_LIMITER.success(endpoint)
+                actual_size = os.path.getsize(part_path)
+                self.log_signal.emit(f"Downloaded {actual_size} bytes for {url}", "info")
+                os.replace(part_path, filepath)
+                saved_size = os.path.getsize(filepath)
+                self.log_signal.emit(f"Saved: {filepath} ({saved_size} bytes)", "success")
+                return True
+            except (RequestException, OSError) as e:
+                self.log_signal.emit(f"Failed to download {url}: {e}\n{traceback.format_exc()}", "error")
+                RATE_LIMITER.failure(endpoint)
+                if attempt < max_retries - 1:
+                    self.log_signal.emit(f"Retrying {url} (attempt {attempt + 2}/{max_retries})...", "info")
+                    RATE_LIMITER.backoff(attempt, should_continue)
+                else:
+                    self.log_signal.emit(f"Max retries reached for {url}, partial file kept for resume", "error")
+        return False
+
+    def response_total_size(self, response):
+        # Full object size from a 200 (Content-Length) or a 206/416 (Content-Range: bytes a-b/total, bytes */total)
+        content_range = response.headers.get('Content-Range', '')
+        if content_range:
+            total = content_range.rsplit("/", 1)[-1].strip()
+            return int(total) if total.isdigit() else 0
+        if response.status_code == 200:
+            return int(response.headers.get('Content-Length', 0) or 0)
+        return 0
+
+    def content_range_start(self, response):
+        # "Content-Range: bytes 1000-1999/2000" -> 1000
+        match = re.match(r'^bytes\s+(\d+)-', response.headers.get('Content-Range', ''))
+        return int(match.group(1)) if match else None
+
+    def discard_partial(self, part_path):
+        try:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+        except OSError as e:
+            self.log_signal.emit(f"Could not remove partial file {part_path}: {e}", "warning")
+
+    def channel_rate(self, ch):
+        # Sample rate from the channel CSV or the NDS channel list, if either knows the channel
+        if ch in self.channel_to_rate:
+            return self.channel_to_rate[ch]
+        return NDS_CATALOG.rate(ch)
+
     def select_time_csv(self):
         file, _ = QFileDialog.getOpenFileName(self, "Select Time CSV", "", "CSV files (*.csv)")
         if file:
@@ -1275,6 +3313,8 @@ class GravfetchApp(GradientWidget):
                         self.time_ranges = self.time_ranges[self.time_ranges['GPSstart'] < self.time_ranges['GPSend']]
                         if self.time_ranges.empty:
                             raise ValueError("No valid segments after filtering invalid rows (GPSstart >= GPSend)")
+                    rows = [f"{int(start)}_{int(end)}" for start, end in zip(self.time_ranges['GPSstart'], self.time_ranges['GPSend'])]
+                    self.append_output(describe_plan(rows, plan_segments(rows)[0]), "info")
                 except ValueError as e:
                     self.append_output(f"Error in Time CSV: Columns must contain numeric values. {e}", "error")
                     QMessageBox.critical(self, "Error", "Time CSV must have numeric GPSstart and GPSend columns.")
@@ -1301,6 +3341,7 @@ class GravfetchApp(GradientWidget):
                 self.channel_csv_file = file
                 channels_df = pd.read_csv(self.channel_csv_file, header=None, skiprows=1, names=["Channel", "Sample Rate"])
                 self.loaded_channels = list(channels_df["Channel"])
+                self.csv_channels = list(self.loaded_channels)
                 self.channel_to_rate.update(dict(zip(channels_df["Channel"], channels_df["Sample Rate"])))
                 self.channel_combo_assoc.clear()
                 self.channel_combo_bulk_nds.clear()
@@ -1328,6 +3369,7 @@ class GravfetchApp(GradientWidget):
 
     def on_channel_select_assoc(self, channel):
         self.selected_channel = channel
+        self.sync_codec_combo(getattr(self, "codec_combo_assoc", None), channel)
         if channel:
             site_prefix = channel.split(':')[0]
             self.frametype_edit.setText(f"{site_prefix}_HOFT_C02")
@@ -1336,36 +3378,170 @@ class GravfetchApp(GradientWidget):
     def on_nds_channel_select(self, current, previous):
         if current:
             self.selected_nds_channel = current.text().split(" (")[0]
-            self.nds_segments_list.clear()
-            if (self.selected_nds_detector_code and 
-                self.selected_nds_channel and 
-                self.selected_nds_channel != "No channels available"):
-                try:
-                    start_time = 1238112018
-                    end_time = 1238198418
-                    chanlist = ChannelList([Channel(self.selected_nds_channel)])
-                    available = chanlist.query_nds2_availability([chanlist[0]], start_time, end_time, host='nds.gwosc.org')
-                    segments = []
-                    display_segments = []
-                    for chan in available:
-                        for i, (start, end) in enumerate(available[chan]):
-                            duration = end - start
-                            segments.append(f"{start}_{end}")
-                            display_segments.append(f"{i+1} {start}_{end} ({duration}s)")
-                    self.nds_segments[self.selected_nds_channel] = segments if segments else ["No segments available"]
-                    self.nds_segments_list.addItems(display_segments if display_segments else ["No segments available"])
-                except Exception as e:
-                    self.log_signal.emit(f"Error fetching time segments for {self.selected_nds_channel}: {e}", "error")
-                    self.nds_segments[self.selected_nds_channel] = ["No segments available"]
-                    self.nds_segments_list.addItems(["No segments available"])
-            else:
-                self.nds_segments_list.addItems(["No segments available"])
-            self.selected_nds_segments = []
+            self.refresh_nds_availability()
+
+    def nds_availability_window(self):
+        try:
+            start = int(float(self.nds_custom_start_edit.text().strip()))
+            end = int(float(self.nds_custom_end_edit.text().strip()))
+            if start < end:
+                return start, end
+        except ValueError:
+            pass
+        return NDS_AVAILABILITY_WINDOW
+
+    def refresh_nds_availability(self):
+        self.nds_segments_list.clear()
+        self.selected_nds_segments = []
+        channel = self.selected_nds_channel
+        if not (self.selected_nds_detector_code and channel and channel != "No channels available"):
+            self.nds_segments_list.addItems(["No segments available"])
+            return
+        start, end = self.nds_availability_window()
+        gaps = NDS_AVAILABILITY.missing(channel, start, end)
+        if not gaps:
+            self.show_nds_availability(channel)
+            return
+        self.nds_segments_list.addItems(["Loading segments..."])
+        FETCH_CORE.submit(self.load_nds_availability(channel, gaps))
+
+    async def load_nds_availability(self, channel, gaps):
+        # Only the parts of the window never asked about before go to the server
+        for start, end in gaps:
+            if not await RATE_LIMITER.wait(NDS_HOST):
+                break
+            try:
+                segments = await FETCH_CORE.call(query_nds_availability, channel, start, end)
+                RATE_LIMITER.success(NDS_HOST)
+                NDS_AVAILABILITY.add(channel, start, end, segments)
+            except Exception as e:
+                RATE_LIMITER.failure(NDS_HOST)
+                self.log_signal.emit(f"Error fetching time segments for {channel} {start}-{end}: {e}", "error")
+        self.nds_availability_signal.emit(channel)
+
+    def show_nds_availability(self, channel):
+        if channel != self.selected_nds_channel:
+            return
+        start, end = self.nds_availability_window()
+        display_segments = [f"{i+1} {int(lo)}_{int(hi)} ({int(hi - lo)}s)"
+                            for i, (lo, hi) in enumerate(NDS_AVAILABILITY.available(channel, start, end))]
+        self.nds_segments_list.clear()
+        self.nds_segments_list.addItems(display_segments if display_segments else ["No segments available"])
+        self.selected_nds_segments = []
 
     def on_channel_select_bulk_nds(self, channel):
         self.selected_bulk_nds_channel = channel
+        self.sync_codec_combo(getattr(self, "codec_combo_bulk_nds", None), channel)
         self.log_signal.emit(f"Debug: Selected channel {channel} for Bulk NDS", "info")
 
+    def create_codec_selector(self, layout, current_channel):
+        # Output format for the channel current_channel() returns; the choice is remembered per channel
+        row = QHBoxLayout()
+        row.addWidget(QLabel("Output format:", font=FONT_LABEL, styleSheet=f"color: {COLOR_FG}; background-color: transparent;"))
+        combo = QComboBox()
+        combo.addItems(list(OUTPUT_CODECS))
+        combo.setCurrentText(self.codec_for(current_channel()))
+        combo.setStyleSheet(f"""
+            QComboBox {{
+                border: 1px solid {COLOR_FG};
+                border-radius: 5px;
+                padding: 4px;
+                background-color: #747576;
+                color: {COLOR_FG};
+            }}
+            QComboBox::drop-down {{
+                border: none;
+            }}
+        """)
+        combo.currentTextChanged.connect(lambda codec: self.set_channel_codec(current_channel(), codec))
+        row.addWidget(combo)
+        layout.addLayout(row)
+        return combo
+
+    def create_export_check(self, layout):
+        # Shared by the fetch tabs; every check box mirrors self.export_mmap
+        check = QCheckBox("Also export memory-mapped .npy for fast partial reads")
+        check.setFont(FONT_LABEL)
+        check.setStyleSheet(f"color: {COLOR_FG}; background-color: transparent;")
+        check.setChecked(self.export_mmap)
+        check.toggled.connect(self.set_export_mmap)
+        layout.addWidget(check)
+        return check
+
+    def create_refetch_check(self, layout):
+        # Shared by the fetch tabs; every check box mirrors self.refetch_existing
+        check = QCheckBox("Refetch segments already on disk (overwrites them)")
+        check.setFont(FONT_LABEL)
+        check.setStyleSheet(f"color: {COLOR_FG}; background-color: transparent;")
+        check.setChecked(self.refetch_existing)
+        check.toggled.connect(self.set_refetch_existing)
+        layout.addWidget(check)
+        self.refetch_checks.append(check)
+        return check
+
+    def set_refetch_existing(self, checked):
+        self.refetch_existing = checked
+        for check in self.refetch_checks:
+            if check.isChecked() != checked:
+                check.setChecked(checked)
+
+    def set_export_mmap(self, checked):
+        self.export_mmap = checked
+        for check in (getattr(self, "export_check_bulk_nds", None), getattr(self, "export_check_assoc", None)):
+            if check is not None and check.isChecked() != checked:
+                check.setChecked(checked)
+
+    def register_exports(self, channels):
+        for ch in channels:
+            path = os.path.join(self.gwfout_path, ch.replace(":", "_"), EXPORT_DIR)
+            if os.path.exists(os.path.join(path, "index.json")):
+                self.exports[ch] = path
+        self.save_history(announce=False)
+
+    def codec_for(self, channel):
+        return self.output_codecs.get(channel, DEFAULT_OUTPUT_CODEC)
+
+    def set_channel_codec(self, channel, codec):
+        if not channel or codec not in OUTPUT_CODECS or self.codec_for(channel) == codec:
+            return
+        if codec == DEFAULT_OUTPUT_CODEC:
+            self.output_codecs.pop(channel, None)
+        else:
+            self.output_codecs[channel] = codec
+        if OUTPUT_CODECS[codec][0] != ".gwf":
+            self.log_signal.emit(f"{channel} will be saved as HDF5; those files are not added to fin.ffl for Omicron", "warning")
+        self.save_history(announce=False)
+
+    def sync_codec_combo(self, combo, channel):
+        if combo is None:
+            return
+        combo.blockSignals(True)
+        combo.setCurrentText(self.codec_for(channel))
+        combo.blockSignals(False)
+
+    def select_benchmark_sample(self):
+        file, _ = QFileDialog.getOpenFileName(self, "Select Sample Frame File", self.gwfout_path, "Frame files (*.gwf *.h5)")
+        if file:
+            self.log_signal.emit(f"Benchmarking output formats on {file}...", "info")
+            FETCH_CORE.submit(self.run_codec_benchmark(file))
+
+    async def run_codec_benchmark(self, path):
+        try:
+            # Files under the output directory carry their channel in the inventory; others use their first channel
+            channel = None
+            inventory = Inventory.open(self.gwfout_path)
+            if os.path.abspath(path).startswith(inventory.root + os.sep):
+                channel = await FETCH_CORE.call(inventory.channel_of, path)
+            data = await FETCH_CORE.call(load_sample, path, channel)
+            self.log_signal.emit(f"Sample: {data.name}, {float(data.duration.value):g} s, "
+                                 f"{data.value.nbytes / 1e6:.1f} MB raw", "info")
+            results = await FETCH_CORE.call(benchmark_codecs, data)
+            for line in format_benchmark(results):
+                self.log_signal.emit(line, "info")
+            self.log_signal.emit("Benchmark complete. Pick a format per channel under Output format.", "success")
+        except Exception as e:
+            self.log_signal.emit(f"Error benchmarking output formats: {e}\n{traceback.format_exc()}", "error")
+
     def select_output_dir(self):
         directory = QFileDialog.getExistingDirectory(self, "Select Output Directory")
         if directory:
@@ -1526,19 +3702,21 @@ class GravfetchApp(GradientWidget):
         if not ch:
             self.append_output("No channel selected for deselecting processed segments.", "warning")
             return
-        ch_dir = os.path.join(self.gwfout_path, ch.replace(":", "_"))
+        inventory = Inventory.open(self.gwfout_path)
         for seg, chk in self.segment_checkboxes.items():
-            tdir = os.path.join(ch_dir, seg)
-            outfile = os.path.join(tdir, f"{ch.replace(':','_')}_{seg}.gwf")
-            if os.path.exists(tdir) and os.path.exists(outfile):
+            # Any output on disk counts, whichever format it was written in
+            if inventory.has_segment(ch.replace(":", "_"), seg):
                 chk.setChecked(False)
                 self.append_output(f"Deselected processed segment: {seg}", "info")
 
-    def save_history(self):
+    def save_history(self, announce=True):
         try:
             with open(HISTORY_FILE, "w") as f:
-                json.dump({"gwfout_path": self.gwfout_path, "channels": self.loaded_channels}, f, indent=2)
-            self.append_output("History saved.", "info")
+                json.dump({"gwfout_path": self.gwfout_path, "channels": self.loaded_channels,
+                           "recent_detectors": self.recent_detectors, "output_codecs": self.output_codecs,
+                           "exports": self.exports}, f, indent=2)
+            if announce:
+                self.append_output("History saved.", "info")
         except Exception as e:
             self.append_output(f"Error saving history: {e}", "error")
 
@@ -1553,9 +3731,13 @@ class GravfetchApp(GradientWidget):
         log_file = "internet_disconnection_log.txt"
         with open(log_file, "a") as log:
             log.write(f"{datetime.now()}: Internet disconnected while fetching {channel} from {start} to {end}\n")
+        attempt = 0
         while not self.is_internet_connected():
-            self.log_signal.emit("Internet disconnected. Waiting 10 minutes to retry...", "warning")
-            time.sleep(600)
+            delay = RATE_LIMITER.backoff_delay(attempt)
+            self.log_signal.emit(f"Internet disconnected. Retrying in {delay:.0f}s...", "warning")
+            if not RATE_LIMITER.sleep(delay, lambda: self.execution_running):
+                return
+            attempt += 1
         self.log_signal.emit("Internet reconnected. Resuming download...", "success")
 
     def toggle_public_execution(self):
@@ -1589,7 +3771,7 @@ class GravfetchApp(GradientWidget):
             self.execution_running = True
             self.status_label_nds.setText("Execution Started")
             self.log_signal.emit("NDS execution started...", "info")
-            threading.Thread(target=self.run_gravfetch_public, args=(segments, False), daemon=True).start()
+            FETCH_CORE.submit(self.run_gravfetch_public(segments, False))
 
     def toggle_assoc_execution(self):
         if self.execution_running:
@@ -1607,7 +3789,7 @@ class GravfetchApp(GradientWidget):
             self.execution_running = True
             self.status_label_assoc.setText("Execution Started")
             self.append_output("Execution started...", "info")
-            threading.Thread(target=self.run_gravfetch_assoc, daemon=True).start()
+            FETCH_CORE.submit(self.run_gravfetch_assoc())
 
     def toggle_bulk_nds_execution(self):
         if self.execution_running:
@@ -1642,7 +3824,7 @@ class GravfetchApp(GradientWidget):
             self.execution_running = True
             self.status_label_bulk_nds.setText("Execution Started")
             self.log_signal.emit("Bulk NDS execution started...", "info")
-            threading.Thread(target=self.run_gravfetch_public, args=(segments, True), daemon=True).start()
+            FETCH_CORE.submit(self.run_gravfetch_public(segments, True))
 
     def toggle_osdf_execution(self):
         if self.execution_running:
@@ -1681,158 +3863,108 @@ class GravfetchApp(GradientWidget):
             self.execution_running = True
             self.status_label_osdf.setText("Execution Started")
             self.log_signal.emit("OSDF execution started...", "info")
-            threading.Thread(target=self.run_osdf_download, args=(segments,), daemon=True).start()
+            FETCH_CORE.submit(self.run_osdf_download(segments))
 
-    def run_gravfetch_public(self, segments, is_bulk=False):
+    async def run_gravfetch_public(self, segments, is_bulk=False):
+        status_label = self.status_label_bulk_nds if is_bulk else self.status_label_nds
         try:
             ch = self.selected_bulk_nds_channel if is_bulk else self.selected_nds_channel
             if not ch or ch == "":
                 self.log_signal.emit("No valid channel selected for NDS execution.", "error")
                 self.execution_running = False
-                status_label = self.status_label_bulk_nds if is_bulk else self.status_label_nds
                 status_label.setText("Execution Failed")
                 return
             os.makedirs(self.gwfout_path, exist_ok=True)
-            ch_dir = os.path.join(self.gwfout_path, ch.replace(":", "_"))
-            os.makedirs(ch_dir, exist_ok=True)
-            fin_path = os.path.join(ch_dir, "fin.ffl")
-            current_dir = os.getcwd()
-
-            with open(fin_path, 'a') as fin:
-                for seg in segments:
-                    if not self.execution_running:
-                        self.log_signal.emit("NDS execution stopped by user.", "warning")
-                        break
-                    try:
-                        start, end = map(int, seg.split("_"))
-                        tdir = os.path.join(ch_dir, f"{start}_{end}")
-                        os.makedirs(tdir, exist_ok=True)
-                        outfile = os.path.join(tdir, f"{ch.replace(':','_')}_{start}_{end}.gwf")
-                        if os.path.exists(outfile):
-                            self.log_signal.emit(f"File {outfile} already fetched for {ch}. Skipping.", "info")
-                            continue
-                        while self.execution_running:
-                            try:
-                                self.log_signal.emit(f"Fetching {ch} from {start} to {end}...", "info")
-                                data = TimeSeries.fetch(ch, start=start, end=end, host="nds.gwosc.org")
-                                actual_start = int(data.times[0].value)
-                                actual_end = int(data.times[-1].value)
-                                if actual_start > start:
-                                    self.log_signal.emit(f"Gap in coverage: {start} to {actual_start}", "warning")
-                                if actual_end < end:
-                                    self.log_signal.emit(f"Gap in coverage: {actual_end} to {end}", "warning")
-                                data.write(outfile)
-                                saved_size = os.path.getsize(outfile)
-                                self.log_signal.emit(f"Saved: {outfile} ({saved_size} bytes)", "success")
-                                rel_path = os.path.relpath(outfile, current_dir).replace("\\", "/")
-                                dt = end - start
-                                fin.write(f"./{rel_path} {start} {dt} 0 0\n")
-                                break
-                            except (ValueError, RuntimeError, socket.error) as e:
-                                self.log_signal.emit(f"Error fetching {ch} {start}-{end}: {e}", "error")
-                                if os.path.exists(outfile):
-                                    os.remove(outfile)
-                                    self.log_signal.emit(f"Deleted interrupted file: {outfile}", "info")
-                                if not self.execution_running:
-                                    self.log_signal.emit("Execution stopped by user.", "warning")
-                                    break
-                                self.wait_for_internet(ch, start, end)
-                            except Exception as e:
-                                self.log_signal.emit(f"Unexpected error fetching {ch} {start}-{end}: {e}\n{traceback.format_exc()}", "error")
-                                break
-                    except ValueError as e:
-                        self.log_signal.emit(f"Invalid segment format {seg}: {e}", "error")
-                        continue
-                    except Exception as e:
-                        self.log_signal.emit(f"Error processing segment {seg} for {ch}: {e}\n{traceback.format_exc()}", "error")
-                        continue
-
-            if ch not in self.loaded_channels and self.execution_running:
-                self.loaded_channels.append(ch)
+            if self.nds_parallel:
+                # Segments are fetched in worker processes, never opening more than the per-host connection cap
+                connections = max(1, min(NDS_MAX_PROCESSES, self.nds_max_connections))
+                self.log_signal.emit(f"Fetching up to {connections} segments at once from {NDS_HOST}", "info")
+            else:
+                connections = 1
+            channels = [ch]
+            if is_bulk and self.nds_bulk_all_channels:
+                # The whole channel CSV per segment over one connection instead of one connection per channel
+                channels += [c for c in self.csv_channels if c != ch]
+                self.log_signal.emit(f"Fetching {len(channels)} channels per segment over one NDS connection", "info")
+            rates = [self.channel_rate(c) for c in channels]
+            await fetch_channel_segments(channels, segments, self.gwfout_path, fetch_nds_channels, self.log_signal.emit,
+                                         should_continue=lambda: self.execution_running, host=NDS_HOST,
+                                         concurrency=connections, on_error=self.wait_for_internet,
+                                         use_processes=self.nds_parallel,
+                                         sample_rate=sum(float(r) for r in rates) if all(rates) else None,
+                                         codecs={c: self.codec_for(c) for c in channels}, export=self.export_mmap,
+                                         refetch=self.refetch_existing)
+            if not self.execution_running:
+                self.log_signal.emit("NDS execution stopped by user.", "warning")
+            if self.export_mmap:
+                self.register_exports(channels)
+
+            new_channels = [c for c in channels if c not in self.loaded_channels]
+            if new_channels and self.execution_running:
+                self.loaded_channels.extend(new_channels)
                 self.save_history()
 
             self.execution_running = False
-            status_label = self.status_label_bulk_nds if is_bulk else self.status_label_nds
             status_label.setText("Execution Finished")
             self.log_signal.emit("NDS execution complete.", "success")
         except Exception as e:
             self.log_signal.emit(f"Error in NDS execution: {e}\n{traceback.format_exc()}", "error")
             self.execution_running = False
-            status_label = self.status_label_bulk_nds if is_bulk else self.status_label_nds
             status_label.setText("Execution Failed")
 
-    def run_gravfetch_assoc(self):
+    async def run_gravfetch_assoc(self):
         try:
             os.makedirs(self.gwfout_path, exist_ok=True)
             ch = self.selected_channel
             if not ch or ch == "":
-                self.append_output("No valid channel selected for Assoc execution.", "error")
+                self.log_signal.emit("No valid channel selected for Assoc execution.", "error")
                 self.execution_running = False
                 self.status_label_assoc.setText("Execution Failed")
                 return
-            ch_dir = os.path.join(self.gwfout_path, ch.replace(":", "_"))
-            os.makedirs(ch_dir, exist_ok=True)
-            fin_path = os.path.join(ch_dir, "fin.ffl")
-            current_dir = os.getcwd()
-
-            with open(fin_path, 'a') as fin:
-                for seg in self.selected_segments:
-                    if not self.execution_running:
-                        self.append_output("Execution stopped by user.", "warning")
-                        break
-                    try:
-                        start, end = map(int, seg.split("_"))
-                        tdir = os.path.join(ch_dir, f"{start}_{end}")
-                        os.makedirs(tdir, exist_ok=True)
-                        outfile = os.path.join(tdir, f"{ch.replace(':','_')}_{start}_{end}.gwf")
-                        if os.path.exists(outfile):
-                            self.append_output(f"Segment {seg} already fetched for {ch}. Skipping.", "info")
-                            continue
-                        while self.execution_running:
-                            try:
-                                self.append_output(f"Fetching {ch} from {start} to {end}...", "info")
-                                site = self.selected_frametype[0]
-                                frametype = self.selected_frametype
-                                host = self.selected_host
-                                urls = find_urls(site, frametype, start, end, host=host)
-                                if not urls:
-                                    self.append_output(f"No data available for {ch} {start}-{end}. Skipping.", "warning")
-                                    continue
-                                data = TimeSeries.read(urls, channel=ch, start=start, end=end)
-                                data.write(outfile)
-                                rel_path = os.path.relpath(outfile, current_dir).replace("\\", "/")
-                                dt = end - start
-                                fin.write(f"./{rel_path} {start} {dt} 0 0\n")
-                                self.append_output(f"Saved to {outfile}", "success")
-                                break
-                            except (ValueError, RuntimeError, socket.error) as e:
-                                self.append_output(f"Error fetching {ch} {start}-{end}: {e}", "error")
-                                if os.path.exists(outfile):
-                                    os.remove(outfile)
-                                    self.append_output(f"Deleted interrupted file: {outfile}", "info")
-                                if not self.execution_running:
-                                    self.append_output("Execution stopped by user.", "warning")
-                                    break
-                                self.wait_for_internet(ch, start, end)
-                            except Exception as e:
-                                self.append_output(f"Unexpected error fetching {ch} {start}-{end}: {e}\n{traceback.format_exc()}", "error")
-                                break
-                    except ValueError as e:
-                        self.append_output(f"Invalid segment format {seg}: {e}", "error")
-                        continue
-                    except Exception as e:
-                        self.append_output(f"Error processing segment {seg} for {ch}: {e}\n{traceback.format_exc()}", "error")
-                        continue
-
-            if ch not in self.loaded_channels and self.execution_running:
-                self.loaded_channels.append(ch)
+            frametype = self.selected_frametype
+            host = self.selected_host
+            channels = [ch]
+            if self.assoc_multi_channel:
+                # Every CSV channel from the same detector lives in the same frames, so read them together
+                site = ch.split(":")[0]
+                channels += [c for c in self.csv_channels if c != ch and c.split(":")[0] == site]
+                self.log_signal.emit(f"Reading {len(channels)} channels from each {frametype} frame", "info")
+
+            url_key = (frametype[0], frametype, "file", host)
+
+            def query_urls(gps_start, gps_end):
+                return find_urls(frametype[0], frametype, gps_start, gps_end, host=host)
+
+            def fetch_assoc_segment(chs, start, end):
+                urls = URL_CACHE.resolve(url_key, start, end, query_urls)
+                if not urls:
+                    return None
+                return TimeSeriesDict.read(urls, chs, start=start, end=end)
+
+            rates = [self.channel_rate(c) for c in channels]
+            await FETCH_CORE.call(bulk_resolve, url_key, self.selected_segments, query_urls, self.log_signal.emit)
+            await fetch_channel_segments(channels, self.selected_segments, self.gwfout_path, fetch_assoc_segment,
+                                         self.log_signal.emit, should_continue=lambda: self.execution_running, host=host,
+                                         concurrency=SEGMENT_CONCURRENCY, on_error=self.wait_for_internet,
+                                         sample_rate=sum(float(r) for r in rates) if all(rates) else None,
+                                         frametype=frametype, codecs={c: self.codec_for(c) for c in channels},
+                                         export=self.export_mmap, refetch=self.refetch_existing,
+                                         split_span=functools.partial(split_at_frames, url_key, query_urls))
+            if not self.execution_running:
+                self.log_signal.emit("Execution stopped by user.", "warning")
+            if self.export_mmap:
+                self.register_exports(channels)
+
+            new_channels = [c for c in channels if c not in self.loaded_channels]
+            if new_channels and self.execution_running:
+                self.loaded_channels.extend(new_channels)
                 self.save_history()
 
             self.execution_running = False
             self.status_label_assoc.setText("Execution Finished")
-            self.append_output("Execution complete.", "success")
+            self.log_signal.emit("Execution complete.", "success")
         except Exception as e:
-            self.append_output(f"Error in Assoc execution: {e}\n{traceback.format_exc()}", "error")
+            self.log_signal.emit(f"Error in Assoc execution: {e}\n{traceback.format_exc()}", "error")
             self.execution_running = False
             self.status_label_assoc.setText("Execution Failed")
 ########################################################################################################################################
@@ -2364,7 +4496,14 @@ class OmicronApp(QWidget):
             self.append_output_signal.emit("No channel directory selected.\n", "warning")
             return
 
-        segments = [d for d in os.listdir(channel_dir) if os.path.isdir(os.path.join(channel_dir, d))]
+        # Channel directories inside an output directory are listed from its inventory; any other directory
+        # is listed as is, without creating an inventory next to it
+        inventory = Inventory.find(os.path.dirname(os.path.abspath(channel_dir)))
+        if inventory is not None:
+            inventory.refresh()
+            segments = inventory.segments(os.path.basename(os.path.abspath(channel_dir)))
+        else:
+            segments = [d for d in os.listdir(channel_dir) if os.path.isdir(os.path.join(channel_dir, d))]
         if not segments:
             self.append_output_signal.emit("No time segments found in selected channel.\n", "error")
             self.show_message_box_signal.emit("Error", "No time segments found in selected channel.", "critical")
@@ -2479,33 +4618,34 @@ class OmicronApp(QWidget):
             dialog.close()
             return
         fin_ffl_path = os.path.join(channel_dir, "fin.ffl")
+        inventory = Inventory.find(os.path.dirname(os.path.abspath(channel_dir)))
+        channel_key = os.path.basename(os.path.abspath(channel_dir))
         try:
-            with open(fin_ffl_path, "w") as ffl_file:
-                for segment in selected_segments:
+            # Every frame in the selected segments, with spans from the inventory (or the file names) rather than the directory name
+            selected_frames = []
+            for segment in selected_segments:
+                # fin.ffl lists frame files only; segments written in another format (e.g. HDF5) are left out
+                if inventory is not None:
+                    rows = inventory.segment_files(channel_key, segment)
+                else:
                     segment_path = os.path.join(channel_dir, segment)
-                    gwf_files = [file for file in os.listdir(segment_path) if file.endswith(".gwf")]
-                    if not gwf_files:
-                        self.append_output_signal.emit(f"No .gwf files found in segment: {segment}\n", "warning")
-                        continue
-                    gwf_file_path = os.path.join(segment_path, gwf_files[0])
-                    gwf_file_path = os.path.relpath(gwf_file_path, start=".").replace("\\", "/")
-                    try:
-                        segment_parts = segment.split("_")
-                        start_time = int(segment_parts[0])
-                        end_time = int(segment_parts[1])
-                        duration = end_time - start_time
-                        if duration <= 0:
-                            self.append_output_signal.emit(f"Invalid duration for segment: {segment}\n", "warning")
-                            continue
-                        ffl_file.write(f"./{gwf_file_path} {start_time} {duration} 0 0\n")
-                    except (ValueError, IndexError) as e:
-                        self.append_output_signal.emit(f"Error processing segment {segment}: {e}\n", "warning")
-                        continue
-            if os.path.getsize(fin_ffl_path) == 0:
+                    rows = [(os.path.join(segment_path, name), start, end) for name, start, end in frame_files(segment_path)]
+                gwf_files = [row for row in rows if row[0].endswith(".gwf")]
+                if not gwf_files:
+                    self.append_output_signal.emit(f"No .gwf files found in segment: {segment}\n", "warning")
+                    continue
+                selected_frames.extend((path, start, end - start) for path, start, end in gwf_files if end > start)
+            if not selected_frames:
                 self.append_output_signal.emit(f"Error: Generated fin.ffl is empty.\n", "error")
                 self.show_message_box_signal.emit("Error", "Generated fin.ffl is empty.", "critical")
                 dialog.close()
                 return
+            frames = FrameList.open(fin_ffl_path)
+            frames.replace(selected_frames)
+            frames.flush()
+            gaps = frames.gaps()
+            if gaps:
+                self.append_output_signal.emit(f"{len(gaps)} gaps between selected frames, listed in {frames.gaps_path}\n", "warning")
             relative_ffl_path = os.path.relpath(fin_ffl_path, os.getcwd()).replace("\\", "/")
             self.ui_elements["DATA FFL"].setText(relative_ffl_path)
             # Extract channel from the parent directory of fin.ffl
@@ -2557,15 +4697,23 @@ class OmicronApp(QWidget):
             self.append_output_signal.emit(f"Error reading history file: {e}\n", "error")
             self.show_message_box_signal.emit("Error", f"Error reading history file: {e}", "critical")
         
-        # Load channels from GWFOUT_DIRECTORY
-        if os.path.exists(base_path) and os.path.isdir(base_path):
-            for d in os.listdir(base_path):
-                dir_path = os.path.join(base_path, d)
-                if os.path.isdir(dir_path):
-                    # Convert H1_ or L1_ to H1: or L1:
-                    if d.startswith("H1_") or d.startswith("L1_"):
-                        d = d.replace("_", ":", 1)
-                    channels.add(d)
+        # Load channels from the GWFOUT_DIRECTORY inventory, picking up directories added since it was last read;
+        # a directory GWeasy never fetched into is listed as is
+        if os.path.isdir(base_path):
+            try:
+                inventory = Inventory.find(base_path)
+                if inventory is not None:
+                    inventory.refresh()
+                    channels.update(inventory.channels())
+                else:
+                    for d in os.listdir(base_path):
+                        if os.path.isdir(os.path.join(base_path, d)) and not d.startswith("."):
+                            # Convert H1_ or L1_ to H1: or L1:
+                            if d.startswith("H1_") or d.startswith("L1_"):
+                                d = d.replace("_", ":", 1)
+                            channels.add(d)
+            except Exception as e:
+                self.append_output_signal.emit(f"Error reading inventory in {base_path}: {e}\n", "warning")
         
         channel_options = sorted(channels) if channels else ["No Channels Available"]
         current_text = self.channel_combo.currentText()
@@ -2714,6 +4862,9 @@ def run_cli_interactive():
             else:
                 print(f"{COLORS['red']}Invalid or non-existent channel CSV file. Please try again.{COLORS['reset']}")
 
+        print(f"{COLORS['blue']}Enter NDS server to fetch from (e.g., {NDS_HOST}) [default: GWOSC frame files]:{COLORS['reset']}")
+        nds_host = input().strip() or None
+
         print(f"{COLORS['blue']}Enter output directory (e.g., ./GWFout) [default: ./GWFout]:{COLORS['reset']}")
         output_dir = input().strip() or DEFAULT_GWFOUT
         if not os.path.exists(output_dir):
@@ -2733,14 +4884,13 @@ def run_cli_interactive():
             logging.error(f"Error processing inputs: {e}")
             return
 
-        # Process each channel sequentially
-        for channel in channels:
-            print(f"{COLORS['blue']}Running Gravfetch for channel: {channel}{COLORS['reset']}")
-            print(f"  Time CSV: {time_csv}")
-            print(f"  Output Directory: {output_dir}")
-            print(f"  Segments: {', '.join(segments)}")
-            args = argparse.Namespace(tab="gravfetch", time_csv=time_csv, channel=channel, output_dir=output_dir, segments=",".join(segments), ffl_file=None)
-            run_cli(args)
+        # All channels in one run, so each frame is read once for every channel it holds
+        print(f"{COLORS['blue']}Running Gravfetch for channels: {', '.join(channels)}{COLORS['reset']}")
+        print(f"  Time CSV: {time_csv}")
+        print(f"  Output Directory: {output_dir}")
+        print(f"  Segments: {', '.join(segments)}")
+        args = argparse.Namespace(tab="gravfetch", time_csv=time_csv, channel=",".join(channels), output_dir=output_dir, segments=",".join(segments), ffl_file=None, nds_host=nds_host)
+        run_cli(args)
 
     elif tab == "omicron":
         print(f"{COLORS['blue']}Enter path to .ffl file (e.g., fin.ffl):{COLORS['reset']}")
@@ -2764,6 +4914,23 @@ def run_cli_interactive():
         args = argparse.Namespace(tab="omicron", time_csv=None, channel=None, output_dir=None, segments=None, ffl_file=ffl_file)
         run_cli(args)
 
+def register_cli_exports(output_dir, channels):
+    for ch in channels:
+        path = os.path.join(output_dir, ch.replace(":", "_"), EXPORT_DIR)
+        if os.path.exists(os.path.join(path, "index.json")):
+            register_export(ch, path)
+            cli_log(f"Export for {ch} registered: {path}", "info")
+
+def run_benchmark_cli(path, channel=None):
+    try:
+        data = load_sample(path, channel)
+        cli_log(f"Sample: {data.name}, {float(data.duration.value):g} s, {data.value.nbytes / 1e6:.1f} MB raw", "info")
+        for line in format_benchmark(benchmark_codecs(data)):
+            print(line)
+    except Exception as e:
+        logging.error(f"Error benchmarking output formats: {e}")
+        print(f"{COLORS['red']}Error benchmarking output formats: {e}{COLORS['reset']}")
+
 def run_cli(args):
     if args.tab == "gravfetch":
         logging.info(f"Running Gravfetch in CLI mode for channel: {args.channel}")
@@ -2777,37 +4944,49 @@ def run_cli(args):
                 time_ranges = pd.read_csv(args.time_csv, header=None, names=['GPSstart', 'GPSend'])
             segments = [f"{int(float(row['GPSstart']))}_{int(float(row['GPSend']))}" for _, row in time_ranges.iterrows()]
             os.makedirs(args.output_dir, exist_ok=True)
-            ch_dir = os.path.join(args.output_dir, args.channel.replace(":", "_"))
-            os.makedirs(ch_dir, exist_ok=True)
-            fin_path = os.path.join(ch_dir, "fin.ffl")
-            with open(fin_path, 'a') as fin:
-                for seg in segments:
-                    start, end = map(int, seg.split("_"))
-                    tdir = os.path.join(ch_dir, f"{start}_{end}")
-                    os.makedirs(tdir, exist_ok=True)
-                    outfile = os.path.join(tdir, f"{args.channel.replace(':','_')}_{start}_{end}.gwf")
-                    if os.path.exists(outfile):
-                        logging.info(f"Segment {seg} already fetched for {args.channel}. Skipping.")
-                        print(f"{COLORS['yellow']}Segment {seg} already fetched for {args.channel}. Skipping.{COLORS['reset']}")
-                        continue
-                    try:
-                        logging.info(f"Fetching {args.channel} from {start} to {end}...")
-                        print(f"{COLORS['blue']}Fetching {args.channel} from {start} to {end}...{COLORS['reset']}")
-                        urls = get_urls(args.channel, start, end, host="gwosc-nds.ligo.org")
-                        if not urls:
-                            logging.warning(f"No data available for {args.channel} {start}-{end}. Skipping.")
-                            print(f"{COLORS['yellow']}No data available for {args.channel} {start}-{end}. Skipping.{COLORS['reset']}")
-                            continue
-                        data = TimeSeries.read(urls, channel=args.channel, start=start, end=end)
-                        data.write(outfile)
-                        rel_path = os.path.relpath(outfile, os.getcwd()).replace("\\", "/")
-                        dt = end - start
-                        fin.write(f"./{rel_path} {start} {dt} 0 0\n")
-                        logging.info(f"Saved to {outfile}")
-                        print(f"{COLORS['green']}Saved to {outfile}{COLORS['reset']}")
-                    except Exception as e:
-                        logging.error(f"Error fetching {args.channel} {start}-{end}: {e}")
-                        print(f"{COLORS['red']}Error fetching {args.channel} {start}-{end}: {e}{COLORS['reset']}")
+            cli_host = "gwosc-nds.ligo.org"
+
+            output_codec = getattr(args, "output_format", None) or DEFAULT_OUTPUT_CODEC
+            export = getattr(args, "export", False)
+            refetch = getattr(args, "refetch", False)
+
+            # --channel takes a comma-separated list; channels of one detector share frames and are read together
+            by_detector = {}
+            for channel in (c.strip() for c in args.channel.split(",")):
+                if channel:
+                    by_detector.setdefault(channel.split(":")[0], []).append(channel)
+
+            if getattr(args, "nds_host", None):
+                # All channels per segment over one NDS2 connection instead of reading GWOSC frame files
+                channels = [ch for chs in by_detector.values() for ch in chs]
+                FETCH_CORE.run(fetch_channel_segments(channels, segments, args.output_dir,
+                                                      functools.partial(fetch_nds_channels, host=args.nds_host), cli_log,
+                                                      host=args.nds_host, concurrency=1, max_retries=3,
+                                                      codecs=dict.fromkeys(channels, output_codec), export=export,
+                                                      refetch=refetch))
+                if export:
+                    register_cli_exports(args.output_dir, channels)
+                return
+
+            for detector, channels in by_detector.items():
+                url_key = (detector, "gwosc", "file", cli_host)
+
+                def query_urls(gps_start, gps_end, detector=detector):
+                    return get_urls(detector, gps_start, gps_end, host=cli_host)
+
+                def fetch_cli_segment(chs, start, end, url_key=url_key, query_urls=query_urls):
+                    urls = URL_CACHE.resolve(url_key, start, end, query_urls)
+                    if not urls:
+                        return None
+                    return TimeSeriesDict.read(urls, chs, start=start, end=end)
+
+                bulk_resolve(url_key, segments, query_urls, cli_log)
+                FETCH_CORE.run(fetch_channel_segments(channels, segments, args.output_dir, fetch_cli_segment, cli_log,
+                                                      host=cli_host, concurrency=SEGMENT_CONCURRENCY, max_retries=3,
+                                                      codecs=dict.fromkeys(channels, output_codec), export=export,
+                                                      refetch=refetch, split_span=functools.partial(split_at_frames, url_key, query_urls)))
+                if export:
+                    register_cli_exports(args.output_dir, channels)
         except Exception as e:
             logging.error(f"Error: {e}")
             print(f"{COLORS['red']}Error: {e}{COLORS['reset']}")
@@ -2882,18 +5061,27 @@ def run_cli(args):
 
 
 def main():
+    # Needed for the NDS process pool in frozen (PyInstaller) builds
+    multiprocessing.freeze_support()
     parser = argparse.ArgumentParser(description="GWeasy CLI")
     parser.add_argument("--cli", action="store_true", help="Run in CLI mode")
     parser.add_argument("--tab", choices=["gravfetch", "omicron", "omiviz"], help="Specify tab to run")
     parser.add_argument("--time_csv", help="Path to time CSV file")
-    parser.add_argument("--channel", help="Channel to fetch")
+    parser.add_argument("--channel", help="Channel to fetch, or a comma-separated list of channels")
     parser.add_argument("--output_dir", help="Output directory")
     parser.add_argument("--segments", help="Comma-separated list of segments (e.g., start1_end1,start2_end2)")
     parser.add_argument("--ffl_file", help="Path to .ffl file for Omicron")
+    parser.add_argument("--nds_host", help="Fetch the channels over NDS2 from this server instead of GWOSC frame files")
+    parser.add_argument("--output_format", choices=list(OUTPUT_CODECS), help="Format and compression of fetched files")
+    parser.add_argument("--export", action="store_true", help="Also export each channel as memory-mapped .npy for fast partial reads")
+    parser.add_argument("--refetch", action="store_true", help="Fetch segments again even if they are already in the output directory")
+    parser.add_argument("--benchmark", help="Benchmark every output format on this sample frame file (use --channel to pick one)")
     args = parser.parse_args()
 
     if args.cli:
-        if args.tab:
+        if args.benchmark:
+            run_benchmark_cli(args.benchmark, args.channel)
+        elif args.tab:
             run_cli(args)
         else:
             run_cli_interactive()